@@ -0,0 +1,242 @@
+# Benchmark which runs each action against a fake Google Sheets backend and counts the API calls it makes.
+#
+# Part of a repository:
+# - https://github.com/kiweezi/halogen-pay
+# Created by:
+# - https://github.com/kiweezi
+#
+# Usage:
+# - python bench/actions.py            Print the calls, bytes and time of each action.
+# - python bench/actions.py --check    Fail if an action makes more API calls than the baseline.
+# - python bench/actions.py --update   Store the current results as the baseline.
+#
+
+
+
+# Shebang
+#!/usr/bin/env python3
+
+# -- Imports --
+
+import io                                               # For hiding the output of the actions.
+import os                                               # For handling file paths and sizes.
+import sys                                              # For arguments and script control.
+import json                                             # For handling json files.
+import time                                             # For timing each action.
+import shutil                                           # For removing the sandbox.
+import importlib                                        # For loading the scripts from the sandbox.
+import contextlib                                       # For hiding the output of the actions.
+from datetime import date                               # For fixing the date of the rollover.
+import startup                                          # For the sandbox copy of the repository.
+import fakesheets                                       # For the fake Google Sheets backend.
+
+# -- End --
+
+
+
+# -- Global Variables --
+
+# Set the baseline file path.
+baseline_path = os.path.join(startup.repo_path, "bench", "actions_baseline.json")
+# Number of payees in each worksheet measured.
+sizes = [10, 100, 10000]
+# Worksheets in the spreadsheet, newest first.
+worksheet_titles = ["October", "September"]
+
+# -- End --
+
+
+
+class BenchDate(date):
+    # A date whose today never changes, so the rollover does the same work on every run.
+
+    @classmethod
+    def today(cls):
+        return cls(2026, 10, 18)
+
+
+def middle_name(payee_no):
+    # Get the name of the payee in the middle of the table.
+    return "Player" + str(payee_no // 2).zfill(5)
+
+
+# Each scenario is a name, an action to run first without counting and the action to measure.
+scenarios = [
+    ("add_payee", None, lambda action, payee_no: action.add_payee({"name": middle_name(payee_no) + "a"})),
+    ("add_payee_last", None, lambda action, payee_no: action.add_payee({"name": "Zed"})),
+    ("remove_payee", None, lambda action, payee_no: action.remove_payee({"name": middle_name(payee_no)})),
+    ("remove_payee_last", None, lambda action, payee_no: action.remove_payee({"name": "Player" + str(payee_no - 1).zfill(5)})),
+    ("update_whitelist", None, lambda action, payee_no: action.update_whitelist("add", "minecraft", {"name": middle_name(payee_no), "new_id": "newplayer"})),
+    ("update_worksheet", None, lambda action, payee_no: action.update_worksheet()),
+    ("pool_open", None, lambda action, payee_no: action.pool_open()),
+    ("pool_remind", None, lambda action, payee_no: action.pool_remind()),
+    ("pool_close", None, lambda action, payee_no: action.pool_close()),
+    ("pool_remind_cached", lambda action, payee_no: action.pool_open(), lambda action, payee_no: action.pool_remind()),
+    ("sync_ledger", None, lambda action, payee_no: action.sync_ledger()),
+    ("sync_ledger_unchanged", lambda action, payee_no: action.sync_ledger(), lambda action, payee_no: action.sync_ledger()),
+    ("sync_ledger_one_change", lambda action, payee_no: action.sync_ledger(), lambda action, payee_no: (action.add_payee({"name": "Zed"}), action.sync_ledger()))
+]
+
+
+def make_sandbox():
+    # Copy the scripts into a temporary repository.
+    sandbox = startup.make_sandbox()
+
+    # Point the config at whitelists, a cache and a webhook inside the sandbox.
+    cfg_path = os.path.join(sandbox, "config", "cfg.json")
+    with open(cfg_path) as json_file:
+        cfg = json.load(json_file)
+    cfg["games"] = [
+        {"name": "Minecraft", "path": "whitelists/whitelist.json", "whitelist": True},
+        {"name": "Valheim", "path": "whitelists/permittedlist.txt", "whitelist": True}
+    ]
+    cfg["mojang"]["cache"] = "config/mojang_cache.json"
+    # Do not pace requests to the fake, as the benchmark counts calls rather than timing Google.
+    cfg["quota"] = {"per_minute": 1000000, "burst": 1000000}
+    with open(cfg_path, "w") as json_file:
+        json.dump(cfg, json_file, indent=4)
+
+    # Write the webhook url the fake answers on.
+    os.makedirs(os.path.join(sandbox, "creds"))
+    with open(os.path.join(sandbox, "creds", "discord_webhook.json"), "w") as json_file:
+        json.dump({"cred": fakesheets.webhook_url}, json_file)
+    os.makedirs(os.path.join(sandbox, "whitelists"))
+
+    # Return the sandbox.
+    return sandbox
+
+
+def load_scripts(sandbox):
+    # Import the scripts from the sandbox, which also moves into it.
+    sys.path.insert(0, os.path.join(sandbox, "scripts"))
+    modules = {name: importlib.import_module(name) for name in ["action", "session", "whitelist", "mojang", "webhook", "ledger"]}
+    # Fix the date the rollover sees.
+    modules["action"].date = BenchDate
+
+    # Return the modules.
+    return modules
+
+
+def reset(modules, payee_no):
+    # Start each scenario with a new spreadsheet and empty whitelists.
+    backend = fakesheets.FakeBackend(worksheet_titles, payee_no)
+    with open("whitelists/whitelist.json", "w") as json_file:
+        json_file.write("[]")
+    with open("whitelists/permittedlist.txt", "w") as text_file:
+        text_file.write("")
+    if os.path.exists("config/mojang_cache.json"):
+        os.remove("config/mojang_cache.json")
+
+    # Forget everything the scripts have cached.
+    modules["whitelist"].stores.clear()
+    modules["mojang"].state.update({"cache": None, "session": backend})
+    modules["webhook"].state.update({"url": None, "session": backend, "reset_at": 0})
+    modules["action"].pool_cache.update({"worksheet": None, "cells": None, "key": None, "values": None})
+    with modules["ledger"].lock:
+        if modules["ledger"].state["connection"] is not None:
+            modules["ledger"].state["connection"].close()
+        modules["ledger"].state.update({"connection": None, "path": None})
+        if os.path.exists("config/ledger.db"):
+            os.remove("config/ledger.db")
+
+    # Connect gspread to the fake, then open the worksheet so only the action's own calls are counted.
+    gspread = importlib.import_module("gspread")
+    session = modules["session"]
+    session.reset()
+    client = gspread.Client(None, session=backend)
+    session.guard_requests(client)
+    session.state["client"] = client
+    modules["action"].get_worksheet()
+
+    # Return the backend.
+    return backend
+
+
+def run_benchmark(modules):
+    # Run every scenario against every size of worksheet.
+    results = {}
+    for payee_no in sizes:
+        results[str(payee_no)] = {}
+        for name, warmup, run in scenarios:
+            backend = reset(modules, payee_no)
+            with contextlib.redirect_stdout(io.StringIO()):
+                if warmup is not None:
+                    warmup(modules["action"], payee_no)
+                backend.counter.reset()
+
+                # Time and count the action.
+                start = time.perf_counter()
+                run(modules["action"], payee_no)
+                duration = time.perf_counter() - start
+
+            results[str(payee_no)][name] = {
+                "calls": dict(sorted(backend.counter.calls.items())),
+                "bytes": backend.counter.total_bytes(),
+                "ms": round(duration * 1000, 1)
+            }
+
+    # Return the results.
+    return results
+
+
+def check(results, baseline):
+    # Compare the calls to each API against the baseline.
+    failures = []
+    for payee_no, scenario_results in results.items():
+        for name, result in scenario_results.items():
+            base = baseline.get(payee_no, {}).get(name)
+            if base is None:
+                continue
+            for api, calls in result["calls"].items():
+                if calls > base["calls"].get(api, 0):
+                    failures.append("`" + name + "` with " + payee_no + " payees makes " + str(calls) + " " + api + " calls, baseline is " + str(base["calls"].get(api, 0)) + ".")
+
+    # Return the failures.
+    return failures
+
+
+# -- Main --
+
+def main(args):
+    # Run the benchmark in a sandbox, returning to the repository afterwards.
+    sandbox = make_sandbox()
+    try:
+        results = run_benchmark(load_scripts(sandbox))
+    finally:
+        os.chdir(startup.repo_path)
+        shutil.rmtree(sandbox)
+
+    # Print the results.
+    for payee_no, scenario_results in results.items():
+        for name, result in scenario_results.items():
+            print(payee_no.rjust(5) + " payees  " + name.ljust(22) + " calls: " + str(result["calls"]) + ", " + str(result["bytes"]) + " bytes, " + str(result["ms"]) + "ms")
+
+    # Store the results as the new baseline, without the timings as they vary between machines.
+    if "--update" in args:
+        for scenario_results in results.values():
+            for result in scenario_results.values():
+                del result["ms"]
+        with open(baseline_path, "w") as json_file:
+            json.dump(results, json_file, indent=4)
+            json_file.write("\n")
+        print("Baseline updated.")
+
+    # Compare the results with the baseline.
+    elif "--check" in args:
+        with open(baseline_path) as json_file:
+            baseline = json.load(json_file)
+        failures = check(results, baseline)
+        for failure in failures:
+            print("FAIL: " + failure)
+        if len(failures) > 0:
+            return 1
+        print("API calls are within the baseline.")
+
+    return 0
+
+
+# Call the main code.
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
+
+# -- End --
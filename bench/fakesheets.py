@@ -0,0 +1,324 @@
+# Script which fakes the Google Sheets, Drive, Mojang and Discord APIs in process, counting every call made.
+#
+# Part of a repository:
+# - https://github.com/kiweezi/halogen-pay
+# Created by:
+# - https://github.com/kiweezi
+#
+# The fake sits below gspread as its HTTP session, so the scripts and gspread run unchanged and every
+# request they would send to Google is counted.
+#
+
+
+
+# Shebang
+#!/usr/bin/env python3
+
+# -- Imports --
+
+import re                                               # For reading ranges.
+import copy                                             # For duplicating worksheets.
+import json                                             # For handling json bodies.
+import hashlib                                          # For making up player UUIDs.
+from datetime import date, timedelta                    # For showing dates the way Google does.
+from urllib.parse import urlsplit, unquote              # For routing requests.
+import requests                                         # For the session and responses gspread expects.
+
+# -- End --
+
+
+
+# -- Global Variables --
+
+# Name and id of the fake spreadsheet.
+spreadsheet_title = "Test Spread"
+spreadsheet_id = "fake-spreadsheet"
+# Day zero of the serial numbers Google uses for dates.
+serial_epoch = date(1899, 12, 30)
+# Headers of the payee table, which starts on the fourth row below the pool details.
+payee_headers = ["Payee", "Cost", "Status", "Minecraft ID", "Valheim ID"]
+pool_headers = ["Cost per payee", "Payment date", "Fully paid?"]
+# Webhook url the fake Discord answers on.
+webhook_url = "https://discord.test/api/webhooks/1/fake"
+
+# -- End --
+
+
+
+def make_worksheet(payee_no):
+    # Build a worksheet with the pool details at the top and a sorted table of payees below.
+    values = [
+        list(pool_headers),
+        ["£2.00", "05/11/2026", "FALSE"],
+        [],
+        list(payee_headers)
+    ]
+    for number in range(payee_no):
+        values.append(["Player" + str(number).zfill(5), "=A2", "Awaiting", "player" + str(number), "viking" + str(number)])
+
+    # Return the rows.
+    return values
+
+
+def to_display(cell):
+    # Show a written cell the way the Sheets API reads it back.
+    value = cell.get("userEnteredValue", {})
+    if "stringValue" in value:
+        return value["stringValue"]
+    if "formulaValue" in value:
+        return value["formulaValue"]
+    if "boolValue" in value:
+        return "TRUE" if value["boolValue"] else "FALSE"
+    if "numberValue" in value:
+        number = value["numberValue"]
+        # Numbers written with a date format read back as a date.
+        if cell.get("userEnteredFormat", {}).get("numberFormat", {}).get("type") == "DATE":
+            return (serial_epoch + timedelta(days=int(number))).strftime("%d/%m/%Y")
+        return str(int(number)) if number == int(number) else str(number)
+    return ""
+
+
+def from_letters(letters):
+    # Convert the collumn letters of A1 notation into a collumn number.
+    col = 0
+    for letter in letters:
+        col = col * 26 + ord(letter) - ord("A") + 1
+    return col
+
+
+class Counter:
+    # Counts the calls and bytes sent to each API.
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        # Forget every call counted so far.
+        self.calls = {}
+        self.bytes = {}
+
+    def add(self, api, sent, received):
+        # Count one call and the bytes in both directions.
+        self.calls[api] = self.calls.get(api, 0) + 1
+        self.bytes[api] = self.bytes.get(api, 0) + sent + received
+
+    def total_bytes(self):
+        return sum(self.bytes.values())
+
+
+class FakeSpreadsheet:
+    # A spreadsheet of worksheets held as rows of displayed values.
+
+    def __init__(self, titles, payee_no):
+        # Every worksheet starts with the same table of payees.
+        self.sheets = []
+        for index, title in enumerate(titles):
+            self.sheets.append({"properties": self.make_properties(index, title, index), "values": make_worksheet(payee_no)})
+        self.version = 1
+
+    def make_properties(self, sheet_id, title, index):
+        # Describe a worksheet the way the Sheets API does.
+        return {"sheetId": sheet_id, "title": title, "index": index, "sheetType": "GRID", "gridProperties": {"rowCount": 20000, "columnCount": 26}}
+
+    def touch(self):
+        # Move the revision on after every edit.
+        self.version += 1
+
+    def modified_time(self):
+        # Make up a modified time which changes with the revision.
+        return "2026-01-01T00:00:" + str(self.version % 60).zfill(2) + "." + str(self.version).zfill(3) + "Z"
+
+    def reindex(self):
+        # Keep each worksheet's index in step with its position.
+        for index, sheet in enumerate(self.sheets):
+            sheet["properties"]["index"] = index
+
+    def get_sheet(self, sheet_id=None, title=None):
+        # Find a worksheet by id or title.
+        for sheet in self.sheets:
+            if sheet["properties"]["sheetId"] == sheet_id or sheet["properties"]["title"] == title:
+                return sheet
+        raise KeyError("No sheet `" + str(sheet_id if title is None else title) + "`.")
+
+
+    def metadata(self):
+        # The spreadsheet and its worksheets, without any cells.
+        return {
+            "spreadsheetId": spreadsheet_id,
+            "properties": {"title": spreadsheet_title, "locale": "en_GB", "timeZone": "Europe/London"},
+            "sheets": [{"properties": copy.deepcopy(sheet["properties"])} for sheet in self.sheets]
+        }
+
+    def get_values(self, range_name):
+        # Read the worksheet, or the cells given, dropping the empty cells at the end of each row as the API does.
+        match = re.match(r"^'?(.*?)'?(?:!([A-Z]+)([0-9]+):([A-Z]+)([0-9]+))?$", range_name)
+        sheet = self.get_sheet(title=match.group(1).replace("''", "'"))
+        rows = [list(row) for row in sheet["values"]]
+        if match.group(2) is not None:
+            start_col, end_col = from_letters(match.group(2)), from_letters(match.group(4))
+            rows = [row[(start_col - 1):end_col] for row in rows[(int(match.group(3)) - 1):int(match.group(5))]]
+        for row in rows:
+            while len(row) > 0 and row[-1] == "":
+                row.pop()
+        while len(rows) > 0 and len(rows[-1]) == 0:
+            rows.pop()
+
+        # Return the range.
+        return {"range": range_name, "majorDimension": "ROWS", "values": rows}
+
+
+    def batch_update(self, body):
+        # Apply each request in order, replying to each.
+        replies = []
+        for request in body["requests"]:
+            (kind, args), = request.items()
+            handler = getattr(self, "apply_" + kind, None)
+            if handler is None:
+                raise ValueError("Unsupported request `" + kind + "`.")
+            replies.append(handler(args) or {})
+        self.touch()
+
+        # Return the replies.
+        return {"spreadsheetId": spreadsheet_id, "replies": replies}
+
+    def apply_insertDimension(self, args):
+        # Insert empty rows or columns.
+        span = args["range"]
+        values = self.get_sheet(sheet_id=span["sheetId"])["values"]
+        count = span["endIndex"] - span["startIndex"]
+        if span["dimension"] == "ROWS":
+            values[span["startIndex"]:span["startIndex"]] = [[] for number in range(count)]
+        else:
+            for row in values:
+                if len(row) > span["startIndex"]:
+                    row[span["startIndex"]:span["startIndex"]] = [""] * count
+
+    def apply_deleteDimension(self, args):
+        # Delete rows or columns.
+        span = args["range"]
+        values = self.get_sheet(sheet_id=span["sheetId"])["values"]
+        if span["dimension"] == "ROWS":
+            del values[span["startIndex"]:span["endIndex"]]
+        else:
+            for row in values:
+                del row[span["startIndex"]:span["endIndex"]]
+
+    def apply_updateCells(self, args):
+        # Write each cell, starting from the top left of the range.
+        start = args["start"]
+        values = self.get_sheet(sheet_id=start["sheetId"])["values"]
+        for row_offset, row in enumerate(args["rows"]):
+            row_index = start["rowIndex"] + row_offset
+            while len(values) <= row_index:
+                values.append([])
+            line = values[row_index]
+            for col_offset, cell in enumerate(row.get("values", [])):
+                col_index = start["columnIndex"] + col_offset
+                while len(line) <= col_index:
+                    line.append("")
+                line[col_index] = to_display(cell)
+
+    def apply_copyPaste(self, args):
+        # Formats are not kept, so only pasting values changes anything.
+        if args.get("pasteType", "PASTE_NORMAL") == "PASTE_FORMAT":
+            return
+        raise ValueError("Only format pastes are supported.")
+
+    def apply_duplicateSheet(self, args):
+        # Copy a worksheet, putting it first unless told otherwise.
+        source = self.get_sheet(sheet_id=args["sourceSheetId"])
+        sheet_id = args.get("newSheetId")
+        if sheet_id is None:
+            sheet_id = max(sheet["properties"]["sheetId"] for sheet in self.sheets) + 1
+        index = args.get("insertSheetIndex") or 0
+        properties = self.make_properties(sheet_id, args.get("newSheetName") or ("Copy of " + source["properties"]["title"]), index)
+        self.sheets.insert(index, {"properties": properties, "values": copy.deepcopy(source["values"])})
+        self.reindex()
+
+        # Reply with the new worksheet.
+        return {"duplicateSheet": {"properties": copy.deepcopy(properties)}}
+
+    def apply_deleteSheet(self, args):
+        # Remove a worksheet.
+        self.sheets.remove(self.get_sheet(sheet_id=args["sheetId"]))
+        self.reindex()
+
+
+class FakeBackend(requests.Session):
+    # A HTTP session which answers every request in process instead of over the network.
+
+    def __init__(self, titles, payee_no):
+        super().__init__()
+        self.spreadsheet = FakeSpreadsheet(titles, payee_no)
+        self.counter = Counter()
+
+    def respond(self, status, body, headers=None):
+        # Build the response gspread and the scripts expect.
+        response = requests.Response()
+        response.status_code = status
+        response._content = json.dumps(body).encode("utf-8")
+        response.encoding = "utf-8"
+        response.headers.update(headers or {})
+        return response
+
+    def request(self, method, url, params=None, data=None, **kwargs):
+        # Get the json body, sent either as json or as data.
+        body = kwargs.get("json")
+        if body is None and data is not None:
+            body = json.loads(data)
+
+        # Route the request to the API it is for.
+        parts = urlsplit(url)
+        headers = None
+        if parts.netloc == "sheets.googleapis.com":
+            api = "sheets"
+            status, reply = self.sheets(method.upper(), unquote(parts.path), body, params)
+        elif parts.path.startswith("/drive/"):
+            api = "drive"
+            status, reply = self.drive(method.upper(), parts.path)
+        elif "mojang" in parts.netloc:
+            api = "mojang"
+            status, reply = self.mojang(body)
+        elif url.startswith(webhook_url):
+            api = "discord"
+            status, reply = 200, {"id": "1"}
+            headers = {"X-RateLimit-Remaining": "4"}
+        else:
+            raise ValueError("No fake for `" + url + "`.")
+
+        # Count the call and the bytes sent each way.
+        response = self.respond(status, reply, headers)
+        sent = len(json.dumps(body).encode("utf-8")) if body is not None else 0
+        self.counter.add(api, sent, len(response.content))
+
+        # Return the response.
+        return response
+
+
+    def sheets(self, method, path, body, params):
+        # Answer the Sheets API.
+        try:
+            if method == "POST" and path.endswith(":batchUpdate"):
+                return 200, self.spreadsheet.batch_update(body)
+            if method == "GET" and path.endswith("/values:batchGet"):
+                return 200, {"spreadsheetId": spreadsheet_id, "valueRanges": [self.spreadsheet.get_values(range_name) for range_name in params["ranges"]]}
+            if method == "GET" and "/values/" in path:
+                return 200, self.spreadsheet.get_values(path.split("/values/", 1)[1])
+            if method == "GET":
+                return 200, self.spreadsheet.metadata()
+        except (KeyError, ValueError) as error:
+            return 400, {"error": {"code": 400, "message": str(error), "status": "INVALID_ARGUMENT"}}
+        return 404, {"error": {"code": 404, "message": "Not found.", "status": "NOT_FOUND"}}
+
+    def drive(self, method, path):
+        # Answer the Drive API, listing the spreadsheet or giving its revision.
+        modified = self.spreadsheet.modified_time()
+        if path.rstrip("/").endswith("/files"):
+            return 200, {"files": [{"id": spreadsheet_id, "name": spreadsheet_title, "createdTime": modified, "modifiedTime": modified}]}
+        return 200, {"id": spreadsheet_id, "modifiedTime": modified, "version": str(self.spreadsheet.version)}
+
+    def mojang(self, names):
+        # Make up a UUID for every player.
+        return 200, [{"id": hashlib.md5(name.encode("utf-8")).hexdigest(), "name": name} for name in names]
+
+# -- End --
@@ -0,0 +1,164 @@
+# Benchmark which measures the import cost of the scripts with `python -X importtime`.
+#
+# Part of a repository:
+# - https://github.com/kiweezi/halogen-pay
+# Created by:
+# - https://github.com/kiweezi
+#
+# Usage:
+# - python bench/startup.py            Print the import cost of each script.
+# - python bench/startup.py --check    Fail if a script got heavier than the baseline.
+# - python bench/startup.py --update   Store the current results as the baseline.
+#
+
+
+
+# Shebang
+#!/usr/bin/env python3
+
+# -- Imports --
+
+import os                                               # For handling file paths and sizes.
+import sys                                              # For arguments and script control.
+import json                                             # For handling json files.
+import shutil                                           # For copying the scripts.
+import tempfile                                         # For a clean copy of the repository.
+import statistics                                       # For the median of the runs.
+import subprocess                                       # For running each import in a fresh process.
+
+# -- End --
+
+
+
+# -- Global Variables --
+
+# Set the repository path.
+repo_path = os.path.abspath(os.path.join(os.path.realpath(__file__), "../../"))
+# Set the baseline file path.
+baseline_path = os.path.join(repo_path, "bench", "startup_baseline.json")
+# The scripts which are started on their own, by cron or by the bot.
+entrypoints = ["runner", "action", "whitelist"]
+# Modules which should only be loaded on the code paths that use them.
+heavy_modules = ["gspread", "oauth2client", "discord", "requests", "aiohttp", "googleapiclient"]
+# Number of fresh processes to measure each script with.
+runs = 7
+# How much slower than the baseline a script can be before the check fails, as timings vary between machines.
+time_tolerance = 3.0
+# How many more modules than the baseline a script can import before the check fails.
+module_tolerance = 1.2
+
+# -- End --
+
+
+
+def make_sandbox():
+    # Copy the scripts and the template config into a temporary repository, so no real config is needed.
+    sandbox = tempfile.mkdtemp(prefix="halogen-bench-")
+    shutil.copytree(os.path.join(repo_path, "scripts"), os.path.join(sandbox, "scripts"), ignore=shutil.ignore_patterns("__pycache__"))
+    os.makedirs(os.path.join(sandbox, "config"))
+    shutil.copy(os.path.join(repo_path, "config", "template.json"), os.path.join(sandbox, "config", "cfg.json"))
+    return sandbox
+
+
+def measure(sandbox, module):
+    # Import the module in a fresh process with import timing turned on.
+    code = "import sys; sys.path.insert(0, 'scripts'); import " + module
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=sandbox, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError("Could not import `" + module + "`:\n" + result.stderr)
+
+    # Read each line of the timings, e.g. `import time:       126 |       4018 | daemon`.
+    modules = []
+    cumulative = 0
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        fields = line[len("import time:"):].split("|")
+        # Drop the single space after the separator, leaving the indentation of nested imports.
+        name = fields[2][1:].rstrip()
+        modules.append(name.strip())
+        # The script itself is the top level entry without indentation, listed after everything it imports.
+        if name == module:
+            cumulative = int(fields[1])
+            break
+        # Forget modules the interpreter loaded before the script, e.g. by `site`, as they vary between machines.
+        if name == name.lstrip():
+            modules = []
+
+    # Return the results.
+    return {"us": cumulative, "modules": modules}
+
+
+def run_benchmark():
+    # Measure every entrypoint, using the median of the runs.
+    sandbox = make_sandbox()
+    results = {}
+    try:
+        for module in entrypoints:
+            samples = [measure(sandbox, module) for run in range(runs)]
+            results[module] = {
+                "us": int(statistics.median(sample["us"] for sample in samples)),
+                "modules": len(samples[-1]["modules"]),
+                "heavy": sorted(name for name in heavy_modules if name in samples[-1]["modules"])
+            }
+    finally:
+        shutil.rmtree(sandbox)
+
+    # Return the results.
+    return results
+
+
+def check(results, baseline):
+    # Compare each entrypoint against the baseline.
+    failures = []
+    for module, result in results.items():
+        base = baseline.get(module)
+        if base is None:
+            continue
+        # A heavy dependency that is now loaded at start up is a regression, whatever the machine.
+        for name in result["heavy"]:
+            if name not in base["heavy"]:
+                failures.append("`" + module + "` now imports `" + name + "` at start up.")
+        if result["modules"] > base["modules"] * module_tolerance:
+            failures.append("`" + module + "` imports " + str(result["modules"]) + " modules, baseline is " + str(base["modules"]) + ".")
+        if result["us"] > base["us"] * time_tolerance:
+            failures.append("`" + module + "` takes " + str(result["us"]) + "us to import, baseline is " + str(base["us"]) + "us.")
+
+    # Return the failures.
+    return failures
+
+
+# -- Main --
+
+def main(args):
+    # Run the benchmark and print the results.
+    results = run_benchmark()
+    for module, result in results.items():
+        print(module + ": " + str(result["us"]) + "us, " + str(result["modules"]) + " modules, heavy: " + str(result["heavy"]))
+
+    # Store the results as the new baseline.
+    if "--update" in args:
+        with open(baseline_path, "w") as json_file:
+            json.dump(results, json_file, indent=4)
+            json_file.write("\n")
+        print("Baseline updated.")
+
+    # Compare the results with the baseline.
+    elif "--check" in args:
+        with open(baseline_path) as json_file:
+            baseline = json.load(json_file)
+        failures = check(results, baseline)
+        for failure in failures:
+            print("FAIL: " + failure)
+        if len(failures) > 0:
+            return 1
+        print("Start up is within the baseline.")
+
+    return 0
+
+
+# Call the main code.
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
+
+# -- End --
@@ -13,11 +13,13 @@
 
 # -- Imports --
 
-import os                                               # For handling file paths and sizes.
-import json                                             # For handling json files.
+import bisect                                           # For finding a payee in the sorted table.
+import threading                                        # For guarding the pool cache between threads.
 from datetime import date                               # For handling dates.
-import gspread                                          # For editting Google sheets.
-from oauth2client.service_account import ServiceAccountCredentials  # For authenticating with Google sheets.
+import session                                          # For the shared Google Sheets session.
+import ledger                                           # For the local copy of the payee table.
+import sheet                                            # For reading worksheets in a single request.
+from settings import config                             # For the shared, cached config.
 
 # -- End --
 
@@ -25,68 +27,50 @@ from oauth2client.service_account import ServiceAccountCredentials  # For authen
 
 # -- Global Variables --
 
-# Set the working directory.
-os.chdir(os.path.abspath(os.path.join(os.path.realpath(__file__), "../../")))
-# Set configuration file path.
-cfg_path = os.path.abspath("config/cfg.json")
-# Load the config file into the program.
-with open(cfg_path) as json_file:
-    config = json.load(json_file)
+# Headers of the worksheet values used by the pool announcements.
+pool_headers = ["Cost per payee", "Payment date", "Fully paid?"]
+# Store where the pool values are in the current worksheet, so they can be read without reading the whole worksheet.
+# Also store the values themselves with the worksheet and spreadsheet revision they were read from.
+pool_cache = {"worksheet": None, "cells": None, "key": None, "values": None}
+pool_lock = threading.RLock()
 
 # -- End --
 
 
 
-def get_google_auth(gsheets_cfg):
-    # Get the credentials to access the spreadsheet.
-    creds = ServiceAccountCredentials.from_json_keyfile_name(os.path.abspath(gsheets_cfg["cred"]), gsheets_cfg["scope"])
-    # Authenticates with the Google API.
-    client = gspread.authorize(creds)
-
-    # Return the client.
-    return client
-
 def get_spreadsheet():
-    # Store the gsheets configuration.
-    gsheets_cfg = config["gsheets"]
-
-    # Get the Google auth client.
-    client = get_google_auth(gsheets_cfg)
-    # Set the spreadsheet to access.
-    spreadsheet = client.open(gsheets_cfg["spreadsheet"])
+    # Get the spreadsheet from the shared session, only opening it once per process.
+    spreadsheet = session.get_spreadsheet(config["gsheets"])
 
     # Return the spreadsheet.
     return spreadsheet
 
-def get_worksheet():
-    # Get the spreadsheet.
-    spreadsheet = get_spreadsheet()
-    # Set the spreadsheet to access.
-    worksheet = spreadsheet.worksheets()[0]
+def get_worksheet(fresh=False):
+    # Get the current worksheet from the shared session, listing the worksheets again if it is about to be written to.
+    worksheet = session.get_worksheet(config["gsheets"], fresh)
 
     # Return the worksheet.
     return worksheet
 
+def get_snapshot(worksheet=None, fresh=False):
+    # Read the whole worksheet once so lookups do not need their own requests.
+    if worksheet is None:
+        worksheet = get_worksheet(fresh)
+
+    # Return the snapshot.
+    return sheet.read_snapshot(worksheet)
 
-def reset_status(worksheet):
-    # Get the number of payees.
-    payee_no = int(get_cell_value("Number of payees"))
 
-    # Get the collumn and row index for the start of the range to update.
-    status_header = worksheet.find("Status")
-    status_col = ''.join([i for i in status_header.address if not i.isdigit()])
-    status_row = status_header.row + 1
 
-    # Get the range of cells to update.
-    named_range = (status_col + str(status_row) + ":" + status_col + str(status_row + (payee_no - 1)))
-    cell_list = worksheet.range(named_range)
+def reset_status(snapshot, batch):
+    # Get the number of payees.
+    payee_no = snapshot.payee_count()
 
-    # Update values.
-    for cell in cell_list:
-        cell.value = "Awaiting"
+    # Get the collumn and row index for the start of the range to update.
+    status_row, status_col = snapshot.find("Status")
 
-    # Update the cells.
-    worksheet.update_cells(cell_list)
+    # Queue the update of the cells.
+    batch.update_range((status_row + 1), status_col, [["Awaiting"]] * payee_no)
 
 def to_camel_case(text):
     # If text is empty just return it.
@@ -99,84 +83,115 @@ def to_camel_case(text):
     # Return the camel cased words.
     return " ".join(word.capitalize() for word in split_text)
 
-def add_payee_row(worksheet, payee, row_index):
-    # Define new row.
-    new_row = [payee["name"], "!tmp", payee["status"]]
+def add_payee_row(batch, payee, row_index, inherit_from_before=False):
+    # Define new row, with the formula in the second cell.
+    new_row = [payee["name"], "=G3", payee["status"]] + payee.get("ids", [])
+
+    # Queue the new row.
+    batch.insert_row(new_row, row_index, inherit_from_before)
+
+def get_roster(snapshot):
+    # Store each row of the payee table as a payee, in the order of the worksheet.
+    roster = []
+    header_row = snapshot.find("Payee")[0]
+    for row_no in range((header_row + 1), (header_row + 1 + snapshot.payee_count())):
+        row = snapshot.row(row_no)
+        # Pad short rows so every payee has a name and status.
+        row += [""] * (3 - len(row))
+        roster.append({"name": row[0], "status": row[2], "ids": row[3:]})
+
+    # Return the roster.
+    return roster
+
+def queue_add_payee(batch, roster, names, name_row, new_payee):
+    # Find where the new payee belongs in the sorted table.
+    index = bisect.bisect_left(names, new_payee["name"])
+    # Do not add the same payee twice.
+    if index < len(names) and names[index] == new_payee["name"]:
+        raise ValueError("Payee `" + new_payee["name"] + "` is already in the worksheet!")
+
+    # If the new payee is at the bottom of the table, add the row below the last one, taking on its end of table format.
+    if index == len(names) and index > 0:
+        add_payee_row(batch, new_payee, (name_row + index), inherit_from_before=True)
+        # Give the old last row the format of the rows above it, if there are any.
+        if index > 1:
+            batch.copy_format((name_row + index - 2), (name_row + index - 1))
+    # Otherwise insert the row in place, taking on the format of the row it pushes down.
+    else:
+        add_payee_row(batch, new_payee, (name_row + index))
 
-    # Insert new row and update the formula.
-    worksheet.insert_row(new_row, row_index)
-    cell_address = worksheet.find("!tmp").address
-    worksheet.update_acell(cell_address, '=G3')
+    # Keep the roster in step with the worksheet.
+    roster.insert(index, new_payee)
+    names.insert(index, new_payee["name"])
 
+def queue_remove_payee(batch, roster, names, name_row, payee):
+    # Find the row which the payee is on.
+    index = bisect.bisect_left(names, payee["name"])
+    if index == len(names) or names[index] != payee["name"]:
+        raise KeyError("Payee `" + payee["name"] + "` could not be found.")
 
-# -- Actions --
+    # If the payee is on the last row, keep the end of table format on the row that becomes last.
+    if index == len(names) - 1 and index > 0:
+        batch.copy_format((name_row + index), (name_row + index - 1))
+    # Delete the row which the payee is on.
+    batch.delete_row(name_row + index)
+    roster.pop(index)
+    names.pop(index)
 
-def add_payee(new_payee):
-    # Get the worksheet from Google API.
-    worksheet = get_worksheet()
 
-    # Correct name formatting.
-    new_payee["name"] = to_camel_case(new_payee["name"])
-    # Define the status of the new payee.
-    new_payee["status"] = "Awaiting"
+# -- Actions --
 
-    # Get the number of payees.
-    payee_no = int(get_cell_value("Number of payees"))
-
-    # Get the current payee names.
-    payee_header = worksheet.find("Payee")
-    # Get the collumn and row index for the start of the range.
-    name_collumn = ''.join([i for i in payee_header.address if not i.isdigit()])
-    name_row = payee_header.row + 1
-    # Create the range to get the names from.
-    name_range = (name_collumn + str(name_row) + ":" + name_collumn + str(name_row + (payee_no - 1)))
-    payee_name_range = worksheet.get(name_range)
-    # Add the names to an array.
-    payee_names = []
-    for item in payee_name_range:
-        for payee in item:
-            payee_names.append(payee)
-    
-    # Get the last name in the array.
-    last_name = payee_names[(payee_no - 1)]
-
-    # Add the new payee to the array, then sort the array.
-    payee_names.append(new_payee["name"])
-    payee_names.sort()
-    # Get the index of the new row to insert.
-    row_index = (name_row + payee_names.index(new_payee["name"]))
-
-    # Add the new payee to the worksheet.
-    # If the new payee is nested inside the table, insert the row.
-    if payee_names[(payee_no)] == last_name:
-        # Insert new row and update the formula.
-        add_payee_row(worksheet, new_payee, row_index)
-    
-    # If the new payee is at the bottom of the table then insert and re-format the row.
-    elif payee_names[(payee_no)] != last_name:
-        # Put the new payee on the 2nd to last row.
-        add_payee_row(worksheet, new_payee, (row_index - 1))
+def update_payees(changes):
+    # Read the worksheet from Google API, making sure it is still the current month after a rollover in another process.
+    snapshot = get_snapshot(fresh=True)
+    # Get the payees and the row they start on.
+    roster = get_roster(snapshot)
+    names = [payee["name"] for payee in roster]
+    name_row = snapshot.find("Payee")[0] + 1
+
+    # Apply each join and leave in order, sending every change in one request.
+    results = []
+    with sheet.WriteBatch(snapshot.worksheet) as batch:
+        for change in changes:
+            payee = change["payee"]
+            # Correct name formatting.
+            payee["name"] = to_camel_case(payee["name"])
+
+            # Store the result of each change so one bad payee does not stop the others.
+            try:
+                if change["instruction"] == "join":
+                    # Define the status of the new payee.
+                    payee["status"] = "Awaiting"
+                    queue_add_payee(batch, roster, names, name_row, payee)
+                elif change["instruction"] == "leave":
+                    queue_remove_payee(batch, roster, names, name_row, payee)
+                results.append(None)
+            except (KeyError, ValueError) as error:
+                results.append(error)
+
+    # Keep the local copy in step with the changes written.
+    for change, result in zip(changes, results):
+        if result is None and change["instruction"] == "join":
+            ledger.add_payee(change["payee"])
+        elif result is None and change["instruction"] == "leave":
+            ledger.remove_payee(change["payee"]["name"])
+
+    # Return the result of each change.
+    return results
 
-        # Switch the last two rows.
-        # Get the last row and details and store them as a payee.
-        last_row = worksheet.row_values(row_index)
-        old_payee = {"name": last_row[0], "id": last_row[3], "status": last_row[2]}
-        # Insert the last row before the new payee row.
-        add_payee_row(worksheet, old_payee, (row_index - 1))
-        # Remove the last row to make the new payee the new last row.
-        worksheet.delete_rows(row_index + 1)
+
+def add_payee(new_payee):
+    # Add the payee through a single change.
+    result = update_payees([{"instruction": "join", "payee": new_payee}])[0]
+    if result is not None:
+        raise result
 
 
 def remove_payee(payee):
-    # Get the worksheet from Google API.
-    worksheet = get_worksheet()
-    # Correct name formatting.
-    payee["name"] = to_camel_case(payee["name"])
-    
-    # Find the row which the payee is on.
-    payee_row = worksheet.find(payee["name"]).row
-    # Delete the row which the payee is on.
-    worksheet.delete_rows(payee_row)
+    # Remove the payee through a single change.
+    result = update_payees([{"instruction": "leave", "payee": payee}])[0]
+    if result is not None:
+        raise result
 
 
 def update_whitelist(instruction, game, payee):
@@ -191,96 +206,240 @@ def update_whitelist(instruction, game, payee):
         print ("payee ID: " + payee["new_id"])
 
     # Update the payee ID in the spreadsheet.
-    # Get the current worksheet.
-    worksheet = get_worksheet()
+    # Read the current worksheet, making sure it is still the current month.
+    snapshot = get_snapshot(fresh=True)
     # Find the cell to update.
-    cell_collumn = worksheet.find(game.capitalize() + " ID").col
-    cell_row = worksheet.find(payee["name"]).row
+    cell_collumn = snapshot.find(game.capitalize() + " ID")[1]
+    cell_row = snapshot.payee_row(payee["name"])
     # Get the current ID for the payee.
-    payee["old_id"] = worksheet.cell(cell_row, cell_collumn).value
-    # Update the cell with the payee ID.
-    worksheet.update_cell(cell_row, cell_collumn, payee["new_id"])
+    payee["old_id"] = snapshot.cell(cell_row, cell_collumn)
 
-    # Call the task through the whitelist file.
+    # Call the task through the whitelist file first, so if it fails the worksheet still has the old ID to remove next time.
     getattr(whitelist, game)(instruction, payee)
 
+    # Update the cell with the payee ID.
+    with sheet.WriteBatch(snapshot.worksheet) as batch:
+        batch.update_cell(cell_row, cell_collumn, payee["new_id"])
+    # Keep the local copy in step with the change written.
+    ledger.set_id(payee["name"], game, payee["new_id"])
+
+
+def reconcile():
+    # Import the whitelist script.
+    import whitelist
+
+    # Read every game's ID collumn from a single read of the current worksheet.
+    snapshot = get_snapshot(fresh=True)
+    # Refresh the local copy from the same read.
+    ledger.store(snapshot)
+    for game_cfg in config["games"]:
+        game = game_cfg["name"].lower()
+        header = game.capitalize() + " ID"
+        if game not in whitelist.store_classes or header not in snapshot.columns:
+            continue
+
+        # Make the game's whitelist match the worksheet.
+        result = whitelist.reconcile(game, snapshot.column(header).values())
+        if result is not None:
+            print (game_cfg["name"] + " whitelist reconciled, added: " + str(result["added"]) + ", removed: " + str(result["removed"]) + ", not found: " + str(result["missing"]))
+
+
+def get_next_month(current_date):
+    # Get the first day of the month after the date given, rolling December over to January.
+    return date(current_date.year + current_date.month // 12, current_date.month % 12 + 1, 1)
+
+def get_sheet_id(next_date, worksheet_list):
+    # Give the new worksheet an id from its month, so a retried rollover can not make a second copy.
+    sheet_id = next_date.year * 100 + next_date.month
+    # Use the next free id if a worksheet already has it.
+    used_ids = [worksheet.id for worksheet in worksheet_list]
+    if sheet_id in used_ids:
+        sheet_id = max(used_ids) + 1
+
+    # Return the id.
+    return sheet_id
 
 def update_worksheet():
     # Get the spreadsheet from Google API.
     spreadsheet = get_spreadsheet()
+    # List the worksheets in the spreadsheet once, newest first.
+    worksheet_list = spreadsheet.worksheets()
+    current_worksheet = worksheet_list[0]
+    # Keep the two newest worksheets, deleting the rest in the same batch.
+    keep_count = 2
 
-    # Get the current day.
-    current_day = date.today().day
+    # Queue every change to the spreadsheet, so the rollover is sent as one batch update that either all applies or does not.
+    with sheet.WriteBatch(current_worksheet) as batch:
+        # If the day of the month is after the 5th then check if the worksheet should be updated.
+        current_date = date.today()
+        if 5 <= current_date.day:
+            # Get next month by name.
+            next_date = get_next_month(current_date)
+            next_month = next_date.strftime("%B")
+
+            # If the next month has no worksheet, then create one.
+            if next_month not in [worksheet.title for worksheet in worksheet_list]:
+                # Read the current worksheet, whose layout the copy shares.
+                snapshot = get_snapshot(current_worksheet)
+                # Duplicate the worksheet to the next month, in front of the others.
+                batch.duplicate_sheet(next_month, get_sheet_id(next_date, worksheet_list))
+                # The copy is now the newest worksheet.
+                keep_count = 1
+
+                # Get the position of the cell through the header.
+                header_row, header_col = snapshot.find("Payment date")
+                # Update the new date.
+                batch.update_cell((header_row + 1), header_col, next_date)
+                # Set all payee status back to 'Awaiting'.
+                reset_status(snapshot, batch)
+
+                # Log this.
+                print ("New worksheet added: " + next_month)
+            # If the worksheet already exists, log this.
+            else:
+                print ("Worksheet `" + next_month + "` already found")
+
+        # Delete the oldest worksheets so there are only two worksheets active.
+        for worksheet in worksheet_list[keep_count:]:
+            batch.delete_sheet(worksheet.id)
+
+    # The list of worksheets has changed, so look it up again next time.
+    session.forget_worksheet()
+    # The local copy is of the old month, so stop answering from it until the next sync.
+    if keep_count == 1:
+        ledger.clear()
+
+
+def sync_ledger():
+    # Ask Drive if the spreadsheet has changed since the last sync, which is far smaller than reading any cells.
+    revision = session.get_revision(config["gsheets"])
+    # A new revision lists the worksheets again, so a month added elsewhere is found before the copy is trusted.
+    worksheet = get_worksheet()
+    if ledger.get_sync("revision") == revision and ledger.get_sync("worksheet_id") == str(worksheet.id):
+        ledger.touch()
+        return
 
-    # If the day of the month is after the 5th then check if the worksheet should be updated.
-    if 5 <= current_day:
-        # List the worksheets in the spreadsheet.
-        worksheet_list = spreadsheet.worksheets()
-        # Get their titles.
-        worksheet_titles = []
-        for sheet in worksheet_list:
-            worksheet_titles.append(sheet.title)
+    # Otherwise read the current worksheet once, only changing the payees whose rows changed.
+    changed, removed = ledger.store(get_snapshot(worksheet), revision)
+    print ("Ledger synced, " + str(changed) + " payees changed and " + str(removed) + " removed.")
+
+
+def get_cell_value(header_value, snapshot=None):
+    # Get the value of the cell below the specified header, from the local copy if it has it.
+    if snapshot is None:
+        value = ledger.get_value(header_value) if ledger.is_synced() else None
+        if value is not None:
+            return value
+        snapshot = get_snapshot()
+    return snapshot.value_below(header_value)
+
+
+def send_alert(message):
+    # For Discord webhooks, reusing the same connection for every alert.
+    import webhook
+    # Send the message.
+    webhook.send(message)
+
+def read_pool_values(snapshot):
+    # Get each pool value that the worksheet has.
+    return {header: snapshot.value_below(header) for header in pool_headers if header in snapshot.index}
+
+
+def store_pool_cells(snapshot):
+    # Remember where each pool header of the worksheet is.
+    with pool_lock:
+        pool_cache["cells"] = {header: snapshot.find(header) for header in pool_headers if header in snapshot.index}
+        pool_cache["worksheet"] = snapshot.worksheet.id
+
+
+def forget_pool_cells():
+    # Find the pool headers again next time, as they have moved.
+    with pool_lock:
+        pool_cache["worksheet"] = None
+
+
+def get_pool_ranges(worksheet):
+    # Get the range of each pool header and the value below it, or none if the worksheet has not been read for them yet.
+    with pool_lock:
+        if pool_cache["worksheet"] != worksheet.id:
+            return None
+        cells = pool_cache["cells"]
+
+    # Return the ranges.
+    return {header: sheet.to_range(worksheet.title, row, col, (row + 1), col) for header, (row, col) in cells.items()}
 
-        # Get next month by name.
-        current_date = date.today()
-        next_date = date(current_date.year, (current_date.month + 1), 1)
-        next_month = next_date.strftime("%B")
-
-        # If the next month has no worksheet, then create one.
-        if next_month not in worksheet_titles:
-            # Get the current worksheet from Google API.
-            current_worksheet = get_worksheet()
-            # Duplicate the worksheet to the next month.
-            current_worksheet.duplicate(new_sheet_name=next_month)
-
-            # Update the payment data.
-            # Get the most up to date worksheet.
-            new_worksheet = get_worksheet()
-            # Get the position of the cell through the header.
-            header = new_worksheet.find("Payment date")
-            # Format new date and update it.
-            next_date = next_date.strftime("%d/%m/%Y")
-            new_worksheet.update_cell((header.row + 1), header.col, next_date)
-
-            # Set all payee status back to 'Awaiting'.
-            reset_status(new_worksheet)
-
-            # Log this.
-            print ("New worksheet added: " + next_month)
-        # If the worksheet already exists, log this.
-        else:
-            print ("Worksheet `" + next_month + "` already found")
-   
-    # Delete the oldest worksheets so there are only two worksheets active.
-    # Get update list of worksheets in the spreadsheet.
-    worksheet_list = spreadsheet.worksheets()
-    # Refine the list to the worksheets needed to be kept.
-    refined_worksheet_list = [worksheet_list[0], worksheet_list[1]]
-    # Loop for each item in the old worksheet list.
-    for worksheet in worksheet_list:
-        # If the worksheet is not in the refined list, then delete it.
-        if worksheet not in refined_worksheet_list:
-            spreadsheet.del_worksheet(worksheet)
 
+def read_pool_ranges(headers, value_ranges):
+    # Get each pool value from its header and value read, or none if a header has moved.
+    values = {}
+    for header, value_range in zip(headers, value_ranges):
+        cells = [row[0] if len(row) > 0 else "" for row in value_range.get("values", [])] + ["", ""]
+        if cells[0] != header:
+            return None
+        values[header] = cells[1]
 
-def get_cell_value(header_value):
-    # Get the value of the cell below the specified header in the worksheet.
+    # Return the values.
+    return values
+
+
+def get_cached_pool_values(key):
+    # Get the pool values last read, or none if they were read from another worksheet or revision.
+    with pool_lock:
+        if pool_cache["key"] != key:
+            return None
+        return pool_cache["values"]
+
+
+def store_pool_values(key, values):
+    # Remember the pool values with the worksheet and revision they were read from.
+    with pool_lock:
+        pool_cache["key"] = key
+        pool_cache["values"] = values
+
+
+def get_pool_values(snapshot=None):
+    # Use the values of a worksheet that has just been read.
+    if snapshot is not None:
+        return read_pool_values(snapshot)
+
+    # Only read the values again if it is a new month or the spreadsheet has been edited since.
+    revision = session.get_revision(config["gsheets"])
     worksheet = get_worksheet()
-    header = worksheet.find(header_value)
-    return worksheet.cell((header.row + 1), header.col).value
+    key = (worksheet.id, revision)
+    values = get_cached_pool_values(key)
+    if values is None:
+        values = read_pool_cells(worksheet)
+        store_pool_values(key, values)
 
+    # Return the values.
+    return values
 
-def send_alert(message):
-    # For Discord webhooks.
-    from discord import Webhook, RequestsWebhookAdapter
-    # Get the webhook url.
-    with open(config["discord"]["webhook"]) as json_file:
-        discord_cred = json.load(json_file)
-    # Create webhook and send the message.
-    webhook = Webhook.from_url(discord_cred["cred"], adapter=RequestsWebhookAdapter())
-    webhook.send(embed=message)
-
-def get_pool_details():
+
+def read_pool_cells(worksheet):
+    # The first time for a worksheet, read it whole to find the headers, taking the values from the same read.
+    ranges = get_pool_ranges(worksheet)
+    if ranges is None:
+        snapshot = get_snapshot(worksheet)
+        store_pool_cells(snapshot)
+        return read_pool_values(snapshot)
+
+    # Otherwise read every pool value with a single request, instead of reading the whole worksheet.
+    if len(ranges) == 0:
+        return {}
+    response = worksheet.spreadsheet.values_batch_get(list(ranges.values()))
+    values = read_pool_ranges(list(ranges), response.get("valueRanges", []))
+
+    # If a header has moved, read the whole worksheet to find them again.
+    if values is None:
+        snapshot = get_snapshot(worksheet)
+        store_pool_cells(snapshot)
+        values = read_pool_values(snapshot)
+
+    # Return the values.
+    return values
+
+
+def get_pool_details(snapshot=None, values=None):
     # Get PayPal and Discord config.
     paypal_cfg = config["paypal"]
     discord_cfg = config["discord"]
@@ -293,9 +452,12 @@ def get_pool_details():
     else:
         details["role"] = "<@&" + str(discord_cfg["allRole"]) + ">"
 
-    # Get cost, payment date, urls and info.
-    details["cost"] = get_cell_value("Cost per payee")
-    details["date"] = get_cell_value("Payment date")
+    # Get cost, payment date and status from the worksheet, unless they have been read already, then the urls and info.
+    if values is None:
+        values = get_pool_values(snapshot)
+    details["cost"] = values["Cost per payee"]
+    details["date"] = values["Payment date"]
+    details["paid"] = values.get("Fully paid?")
     details["pool_url"] = paypal_cfg["pool"]
     details["thumb_url"] = paypal_cfg["thumbnail"]
     details["info"] = str(discord_cfg["channel"])
@@ -304,12 +466,12 @@ def get_pool_details():
     return details
 
 
-def pool_open():
+def pool_open(values=None):
     # For Discord embeded messages.
     from discord import Embed, Color
 
     # Get pool details.
-    details = get_pool_details()
+    details = get_pool_details(values=values)
 
     # Create the embed message to send.
     # Initialise embed properties.
@@ -329,19 +491,18 @@ def pool_open():
     # Send the webhook message.
     send_alert(embed)
 
-def pool_remind():
+def pool_remind(values=None):
+    # Get pool details, which include the status.
+    details = get_pool_details(values=values)
+
     # Only send a reminder if the pool has not been paid.
-    status_cell = get_cell_value("Fully paid?")
-    if status_cell == "FALSE":
+    if details["paid"] == "FALSE":
         # Get the payment status and date.
         status = "Unpaid ❌"
 
         # For Discord embeded messages.
         from discord import Embed, Color
 
-        # Get pool details.
-        details = get_pool_details()
-
         # Create the embed message to send.
         # Initialise embed properties.
         embed = Embed(
@@ -362,16 +523,15 @@ def pool_remind():
     else:
         print ("Pool has already been paid.")
 
-def pool_close():
+def pool_close(values=None):
     # For Discord embeded messages.
     from discord import Embed, Color
 
-    # Get pool details.
-    details = get_pool_details()
+    # Get pool details, which include the status.
+    details = get_pool_details(values=values)
 
     # Get the payment status.
-    status_cell = get_cell_value("Fully paid?")
-    if status_cell == "TRUE":
+    if details["paid"] == "TRUE":
         status = "Paid ✅"
     else:
         status = "Unpaid ❌"
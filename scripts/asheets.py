@@ -0,0 +1,135 @@
+# Script which reads Google Sheets from the bot's event loop, so reads wait on Google without holding a thread each.
+#
+# Part of a repository:
+# - https://github.com/kiweezi/halogen-pay
+# Created by:
+# - https://github.com/kiweezi
+#
+
+
+
+# Shebang
+#!/usr/bin/env python3
+
+# -- Imports --
+
+import time                                             # For timing waits for the budget.
+import asyncio                                          # For waiting without blocking the bot.
+import aiohttp                                          # For requests from the event loop, shared with discord.
+import session                                          # For the access token of the shared session.
+import quota                                            # For pacing requests to Google.
+import metrics                                          # For timing requests and counting retries.
+from settings import config                             # For the shared, cached config.
+
+# -- End --
+
+
+
+# -- Global Variables --
+
+# Address of the Sheets API.
+sheets_url = "https://sheets.googleapis.com/v4/spreadsheets/"
+# Address of the Drive API, for the spreadsheet's revision.
+drive_url = "https://www.googleapis.com/drive/v3/files/"
+# Seconds to wait for Google before giving up on a request.
+timeout = 30
+# Store the HTTP session, opened on the bot's event loop the first time it is needed, and the executor to log in on.
+state = {"session": None, "executor": None}
+
+# -- End --
+
+
+
+class ResponseError(Exception):
+    # A request Google answered with an error, keeping the status and how long Google asked to wait.
+
+    def __init__(self, status, retry_after=None):
+        super().__init__("Google API returned " + str(status) + ".")
+        self.status = status
+        self.retry_after = retry_after
+
+
+def get_session():
+    # Open the HTTP session the first time it is needed, reusing its connections for every request.
+    if state["session"] is None or state["session"].closed:
+        state["session"] = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=timeout))
+
+    # Return the session.
+    return state["session"]
+
+
+def set_executor(executor):
+    # Log in on the given executor, so it counts towards the same limit as every other blocking call.
+    state["executor"] = executor
+
+
+async def get_token(renew=False):
+    # Get the token from the shared session in a thread, as logging in is blocking.
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(state["executor"], session.get_token, config["gsheets"], renew)
+
+
+async def acquire():
+    # Wait until the budget shared with gspread allows another request, without holding up the event loop.
+    delay = quota.take_token()
+    if delay == 0:
+        return
+
+    # Wait in turn with any other requests over the budget.
+    quota.set_waiting(1)
+    start = time.perf_counter()
+    try:
+        while delay > 0:
+            await asyncio.sleep(delay)
+            delay = quota.take_token()
+    finally:
+        quota.set_waiting(-1)
+        metrics.observe("halogen_quota_wait_seconds", (("operation", metrics.operation.get()),), time.perf_counter() - start)
+
+
+async def request(api, method, url, params=None):
+    # Send a request within the budget, trying again while Google is rate limiting or overloaded.
+    attempt = 0
+    renew = False
+    while True:
+        await acquire()
+        headers = {"Authorization": "Bearer " + await get_token(renew)}
+        try:
+            with metrics.external(api):
+                async with get_session().request(method, url, params=params, headers=headers) as response:
+                    if response.status >= 400:
+                        raise ResponseError(response.status, response.headers.get("Retry-After"))
+                    return await response.json()
+
+        except ResponseError as error:
+            # Log in again and retry once if the token was rejected.
+            if error.status == 401 and not renew:
+                print ("Google session rejected, reconnecting.")
+                renew = True
+            # Otherwise only retry rate limits and server errors, up to the limit.
+            elif not quota.is_retryable_status(error.status) or attempt >= quota.get_setting("retries"):
+                raise
+            else:
+                delay = quota.get_backoff(attempt, error.retry_after)
+                print ("Google API returned " + str(error.status) + ", retrying in " + str(round(delay, 1)) + "s.")
+                await asyncio.sleep(delay)
+                attempt += 1
+            metrics.add_retry(api)
+
+
+async def get_revision(spreadsheet_id):
+    # Ask Drive when the spreadsheet was last changed, letting the shared session drop its worksheet if it has.
+    params = [("fields", "modifiedTime,version"), ("supportsAllDrives", "true")]
+    revision = session.to_revision(await request("drive", "GET", drive_url + spreadsheet_id, params))
+    session.note_revision(revision)
+
+    # Return the revision.
+    return revision
+
+
+async def batch_get(spreadsheet_id, ranges):
+    # Read every range given with a single request, returning the values of each in the same order.
+    params = [("ranges", range_name) for range_name in ranges]
+    response = await request("sheets", "GET", sheets_url + spreadsheet_id + "/values:batchGet", params)
+    return response.get("valueRanges", [])
+
@@ -13,14 +13,24 @@
 
 # -- Imports --
 
-import os                                               # For handling file paths and sizes.
 import json                                             # For handling json files.
 import discord                                          # To integrate with Discord.
 from discord.ext import commands                        # Control the Discord bot.
-import aiohttp                                          # For API requests.
 import asyncio                                          # For API requests.
+import functools                                        # For passing arguments to blocking calls.
+import contextvars                                      # For timing blocking calls against their command.
+import time                                             # For showing how old the local copy is.
+from concurrent.futures import ThreadPoolExecutor       # For running blocking calls off the event loop.
 import action                                           # Action script to impliment changes.
+import mutations                                        # For ordering changes to the spreadsheet.
+import ledger                                           # For answering lookups from the local copy.
+import jobs                                             # For keeping changes on disk until they are applied.
+import asheets                                          # For reading Google Sheets from the event loop.
 import runner                                           # For calling runner tasks.
+import scheduler                                        # For running scheduled tasks inside the bot.
+import daemon                                           # For taking tasks from runner.py.
+import metrics                                          # For timing commands and tasks.
+from settings import config                             # For the shared, cached config.
 
 # -- End --
 
@@ -28,13 +38,20 @@ import runner                                           # For calling runner tas
 
 # -- Global Variables --
 
-# Set the working directory.
-os.chdir(os.path.abspath(os.path.join(os.path.realpath(__file__), "../../")))
-# Set configuration file path.
-cfg_path = os.path.abspath("config/cfg.json")
-# Load the config file into the program.
-with open(cfg_path) as json_file:
-    config = json.load(json_file)
+# Seconds to wait for each command before giving up, unless the config says otherwise.
+default_timeouts = {"join": 60, "leave": 60, "whitelist": 90, "run": 300, "status": 60, "unpaid": 60, "roster": 60}
+# Tasks which read the pool values from the event loop before running.
+pool_tasks = ["pool_open", "pool_remind", "pool_close"]
+# Status of a payee who has paid this month.
+paid_status = "Paid"
+# Lines on each page of a long reply, the reactions that turn the pages and how long they work for.
+page_size = 20
+page_emojis = ["⬅️", "➡️"]
+page_timeout = 300
+# Wakes the job worker when a job is added, created once the bot is running.
+job_state = {"wake": None}
+# Limit the number of blocking calls that can run at the same time.
+executor = ThreadPoolExecutor(max_workers=config.get("bot", {}).get("workers", 4), thread_name_prefix="action")
 
 # -- End --
 
@@ -48,6 +65,308 @@ def get_cred(file_path):
     return cred_file["cred"]
 
 
+def get_timeout(cmd):
+    # Get the timeout for a command from the latest config.
+    return config.get("bot", {}).get("timeouts", {}).get(cmd, default_timeouts.get(cmd))
+
+
+async def run_blocking(cmd, func, *args):
+    # Run a blocking call in the executor so the bot keeps responding while it waits.
+    loop = asyncio.get_running_loop()
+    # Carry the command over to the executor so its calls are timed against it.
+    context = contextvars.copy_context()
+    call = loop.run_in_executor(executor, functools.partial(context.run, func, *args))
+    # Give up waiting once the command's timeout is reached.
+    return await asyncio.wait_for(call, get_timeout(cmd))
+
+async def run_queued(cmd, future):
+    # Wait for a change submitted to the spreadsheet's mutation queue.
+    return await asyncio.wait_for(asyncio.wrap_future(future), get_timeout(cmd))
+
+async def run_queued_all(cmd, futures):
+    # Wait for changes submitted together, keeping the error of each instead of raising it.
+    waiting = asyncio.gather(*[asyncio.wrap_future(future) for future in futures], return_exceptions=True)
+    return await asyncio.wait_for(waiting, get_timeout(cmd))
+
+
+async def apply_payees(cmd, names):
+    # Queue a join or leave for every valid name together, so they are applied in one batch.
+    payees, results = runner.prepare_payees(cmd, names)
+    valid = [index for index, result in enumerate(results) if result is None]
+    if len(valid) > 0:
+        futures = mutations.get_queue().submit_payees(cmd, [payees[index] for index in valid])
+        for index, result in zip(valid, await run_queued_all(cmd, futures)):
+            results[index] = result
+
+    # Return the payees and the result of each.
+    return payees, results
+
+async def run_payees(cmd, names):
+    # Apply the joins or leaves, and summarise the results.
+    payees, results = await apply_payees(cmd, names)
+    return runner.describe_payees(cmd, payees, results)
+
+
+async def get_pool_values():
+    # Only read the values again if it is a new month or the spreadsheet has been edited since.
+    spreadsheet = await run_blocking("run", action.get_spreadsheet)
+    revision = await asheets.get_revision(spreadsheet.id)
+    worksheet = await run_blocking("run", action.get_worksheet)
+    key = (worksheet.id, revision)
+    values = action.get_cached_pool_values(key)
+    if values is None:
+        values = await read_pool_cells(worksheet)
+        action.store_pool_values(key, values)
+
+    # Return the values.
+    return values
+
+async def read_pool_cells(worksheet):
+    # Get where the pool values are, known once the worksheet has been read for them this month.
+    ranges = action.get_pool_ranges(worksheet)
+
+    # Read every pool value from the event loop with a single request.
+    values = None
+    if ranges is not None and len(ranges) > 0:
+        values = action.read_pool_ranges(list(ranges), await asheets.batch_get(worksheet.spreadsheet.id, list(ranges.values())))
+        # If a header has moved, find them all again.
+        if values is None:
+            action.forget_pool_cells()
+    # Otherwise let the action read the whole worksheet to find them.
+    if values is None:
+        values = await run_blocking("run", action.read_pool_cells, worksheet)
+
+    # Return the values.
+    return values
+
+async def run_task(task):
+    # Run pool tasks with their values read from the event loop, and queue tasks which write to the spreadsheet.
+    instruction = runner.get_instruction(task)
+    if instruction not in pool_tasks and instruction not in runner.queued_tasks:
+        return await run_blocking("run", runner.run_task, task)
+    try:
+        # Queue tasks which write to the spreadsheet behind the joins and leaves before them.
+        if instruction in runner.queued_tasks:
+            await run_queued("run", mutations.get_queue().submit_call(getattr(action, instruction)))
+        else:
+            values = await get_pool_values()
+            await run_blocking("run", getattr(action, instruction), values)
+        msg = [("Task `" + instruction + "` completed successfully!"), True]
+    # Let timeouts through to be reported as such.
+    except asyncio.TimeoutError:
+        raise
+    except:
+        msg = [("Task `" + instruction + "` failed!"), False]
+
+    # Return the result of the task.
+    print(msg[0])
+    return msg
+
+
+def get_schedule():
+    # Get the scheduled tasks from the config, using the instruction each alias maps to.
+    entries = []
+    for entry in config.get("schedule", []):
+        instruction = runner.get_instruction(entry["task"])
+        if instruction == False:
+            print ("Scheduled task `" + entry["task"] + "` could not be found, skipping it.")
+        else:
+            entries.append({"cron": entry["cron"], "task": instruction})
+
+    # Return the entries.
+    return entries
+
+async def run_scheduled(task, names=None):
+    # Run a scheduled task the same way as the run command, reusing the bot's session and timing it by its instruction.
+    with metrics.track(runner.get_instruction(task) or task):
+        # Joins and leaves from runner.py go through the mutation queue, the same as the commands.
+        if names is not None:
+            result = await run_payees(task, names)
+        else:
+            result = await run_task(task)
+        # Count tasks which report that they failed.
+        if result[1] == False:
+            metrics.add_error()
+
+    # Return the result.
+    return result
+
+
+async def sync_ledger_forever():
+    # Keep the local copy of the payee table up to date, so lookups do not wait on Google.
+    while True:
+        try:
+            with metrics.track("sync_ledger"):
+                await run_blocking("run", action.sync_ledger)
+        except Exception as error:
+            print ("Could not sync the ledger: " + repr(error))
+        # Wait for the next sync, reading the interval again in case the config changed.
+        await asyncio.sleep(ledger.get_setting("interval"))
+
+
+async def get_ledger(cmd, options):
+    # Sync the local copy first when asked to with `--fresh`, or when it is too old to trust.
+    if "--fresh" in options or not ledger.is_synced():
+        await run_blocking(cmd, action.sync_ledger)
+
+    # Describe where the reply came from.
+    age = int(time.time() - float(ledger.get_sync("synced")))
+    return "From " + str(ledger.get_sync("worksheet")) + ", checked " + str(age) + "s ago. Add --fresh to check now."
+
+
+def make_pages(title, lines, color, footer):
+    # Split the lines into embeds of a page each.
+    pages = [lines[start:(start + page_size)] for start in range(0, len(lines), page_size)] or [[]]
+    embeds = []
+    for page_no, page in enumerate(pages, start=1):
+        embed = discord.Embed(title=title, description="\n".join(page), color=color)
+        if len(pages) > 1:
+            embed.set_footer(text="Page " + str(page_no) + " of " + str(len(pages)) + ". " + footer)
+        else:
+            embed.set_footer(text=footer)
+        embeds.append(embed)
+
+    # Return the pages.
+    return embeds
+
+async def turn_pages(ctx, message, embeds):
+    # Turn the pages when the user who asked reacts, until the reactions time out.
+    page_no = 0
+    check = lambda reaction, user: reaction.message.id == message.id and user == ctx.author and str(reaction.emoji) in page_emojis
+    while True:
+        try:
+            reaction, user = await ctx.bot.wait_for("reaction_add", timeout=page_timeout, check=check)
+        except asyncio.TimeoutError:
+            break
+
+        # Move a page either way, wrapping around at the ends.
+        page_no = (page_no + (1 if str(reaction.emoji) == page_emojis[1] else -1)) % len(embeds)
+        await message.edit(embed=embeds[page_no])
+        # Take the user's reaction back off so it can be pressed again, if the bot is allowed to.
+        try:
+            await message.remove_reaction(reaction.emoji, user)
+        except discord.HTTPException:
+            pass
+
+async def send_pages(ctx, embeds):
+    # Send the first page, with reactions to turn the pages if there are more.
+    message = await ctx.send(embed=embeds[0])
+    if len(embeds) > 1:
+        for emoji in page_emojis:
+            await message.add_reaction(emoji)
+        # Turn the pages in the background, so the command itself is done.
+        asyncio.ensure_future(turn_pages(ctx, message, embeds))
+
+
+def wake_jobs():
+    # Let the job worker know there is a new job.
+    if job_state["wake"] is not None:
+        job_state["wake"].set()
+
+async def wait_for_jobs(timeout=None):
+    # Wait until a job is added, or the timeout passes.
+    try:
+        await asyncio.wait_for(job_state["wake"].wait(), timeout)
+    except asyncio.TimeoutError:
+        pass
+    job_state["wake"].clear()
+
+async def queue_job(ctx, kind, args, description):
+    # Store the job on disk before replying, so it is applied even if the bot stops.
+    job_id = jobs.add(kind, args)
+    channel_id, message_id = None, None
+    try:
+        # Reply straight away, saying how many jobs are ahead.
+        ahead = jobs.count_pending() - 1
+        msg = "Queued " + description + " as job `#" + str(job_id) + "`"
+        if ahead > 0:
+            msg += ", behind `" + str(ahead) + "` other jobs"
+        message = await ctx.send(embed=discord.Embed(description=msg + ".", color=discord.Color.blue()))
+        channel_id, message_id = message.channel.id, message.id
+    finally:
+        # Let the job be applied, editing the reply if there is one.
+        jobs.set_reply(job_id, channel_id, message_id)
+        wake_jobs()
+
+async def edit_reply(bot, job, text, color):
+    # Show the state of a job in the reply to the command which asked for it.
+    print ("Job #" + str(job["id"]) + ": " + text)
+    if job["channel"] is None:
+        return
+    try:
+        channel = bot.get_channel(job["channel"]) or await bot.fetch_channel(job["channel"])
+        message = await channel.fetch_message(job["message"])
+        await message.edit(embed=discord.Embed(description=text, color=color))
+    except discord.HTTPException as error:
+        print ("Could not edit the reply for job #" + str(job["id"]) + ": " + repr(error))
+
+def is_applied(kind, name, result):
+    # Check if a join or leave was turned down only because an earlier attempt already applied it.
+    if runner.check_name(name) is not None:
+        return False
+    return (kind == "join" and isinstance(result, ValueError)) or (kind == "leave" and isinstance(result, KeyError))
+
+async def apply_job(job, replay=False):
+    # Apply a job, raising any error that is worth trying again.
+    args = job["args"]
+    if job["kind"] in mutations.payee_kinds:
+        payees, results = await apply_payees(job["kind"], args["names"])
+        for index, result in enumerate(results):
+            if isinstance(result, Exception) and not isinstance(result, (KeyError, ValueError)):
+                raise result
+            # An earlier attempt may have been written even though it timed out or the bot stopped.
+            if replay and is_applied(job["kind"], args["names"][index], result):
+                results[index] = None
+        return runner.describe_payees(job["kind"], payees, results)
+
+    elif job["kind"] == "whitelist":
+        payee = args["payee"]
+        try:
+            await run_queued("whitelist", mutations.get_queue().submit_call(action.update_whitelist, args["instruction"], args["game"], payee))
+        # If the payee could not be found, the whitelist can not be updated.
+        except KeyError:
+            return ["Could not update whitelist for `" + action.to_camel_case(payee["name"]) + "`", False]
+        return ["Username / ID updated for `" + payee["name"] + "`", True]
+
+    return ["Job kind `" + job["kind"] + "` is not known.", False]
+
+async def run_job(bot, job):
+    # Apply a job, timing it against its kind.
+    with metrics.track(job["kind"] + "_job"):
+        try:
+            msg = await apply_job(job, jobs.start(job))
+        # Try again later if Google or the bot could not finish the job.
+        except Exception as error:
+            attempts, delay = jobs.retry(job, repr(error))
+            if attempts <= jobs.get_setting("retries"):
+                await edit_reply(bot, job, "Job `#" + str(job["id"]) + "` could not be applied yet, trying again in `" + str(int(delay)) + "` seconds (attempt " + str(attempts) + " of " + str(jobs.get_setting("retries")) + ").", discord.Color.gold())
+                return
+            msg = ["Job `#" + str(job["id"]) + "` failed after " + str(attempts) + " attempts, check the worksheet before trying again.", False]
+
+        # Store the result and show it in the reply.
+        jobs.finish(job, "done" if msg[1] else "failed", msg)
+        if msg[1] == False:
+            metrics.add_error()
+        # Cut long summaries down to fit in a single embed.
+        if len(msg[0]) > 4000:
+            msg[0] = msg[0][:4000].rsplit("\n", 1)[0] + "\n..."
+        await edit_reply(bot, job, msg[0], discord.Color.green() if msg[1] else discord.Color.red())
+
+async def run_jobs_forever(bot):
+    # Apply the jobs in the order they were asked for, for as long as the bot runs.
+    while True:
+        try:
+            ready, wait = jobs.get_ready(mutations.payee_kinds)
+            if len(ready) == 0:
+                await wait_for_jobs(wait)
+                continue
+            # Apply joins and leaves waiting together, so the mutation queue merges them into one batch.
+            await asyncio.gather(*[run_job(bot, job) for job in ready])
+        except Exception as error:
+            print ("Could not apply jobs: " + repr(error))
+            await asyncio.sleep(1)
+
+
 async def add_react(ctx):
     # Define the emoji to react with.
     emoji = "👌"
@@ -87,14 +406,47 @@ async def send_message(ctx, msg_list, color):
     await ctx.send(embed=embed)
 
 async def send_error(ctx, msg_list):
-    # Send an embeded error message.
+    # Count the error against the command, then send an embeded error message.
+    metrics.add_error()
     await send_message(ctx, msg_list, discord.Color.red())
 
 async def send_default_error(ctx, cmd):
     # Send an embeded error message, directing the user to the help command.
     msg_list = ["Command failed, try running `-help ", cmd, "` for help using this command."]
     await send_error(ctx, msg_list)
-        
+
+async def send_timeout_error(ctx, cmd):
+    # Send an embeded error message, telling the user the command took too long.
+    print ("Command `" + cmd + "` timed out.")
+    msg_list = ["Command `", cmd, "` timed out after `", str(get_timeout(cmd)), "` seconds, check the worksheet before trying again."]
+    await send_error(ctx, msg_list)
+
+
+async def change_payees(ctx, cmd, full_names):
+    # Add or remove every payee named by a join or leave command.
+    try:
+        # Continue if the role is correct.
+        if await check_role(ctx):
+            # Take names from the arguments and from any csv attached to the message.
+            names = list(full_names)
+            for attachment in ctx.message.attachments:
+                names += runner.parse_names((await attachment.read()).decode("utf-8-sig"))
+
+            # Check there are names and display an error if not.
+            if len(names) == 0:
+                await send_error(ctx, ["Payee name should not be empty!"])
+            # Continue to action if there are names.
+            else:
+                # Add reaction to the users message so they know the command is working.
+                await add_react(ctx)
+
+                # Queue every name as one job, replying now and editing the reply with the result.
+                description = "`" + cmd + "` for `" + names[0] + "`" if len(names) == 1 else "`" + cmd + "` for `" + str(len(names)) + "` payees"
+                await queue_job(ctx, cmd, {"names": names}, description)
+
+    except:
+        # Send an embeded error message, directing the user to the help command.
+        await send_default_error(ctx, cmd)
 
 
 # -- Main --
@@ -105,6 +457,11 @@ def main():
 
     # Set a command prefix and description for the bot.
     bot = commands.Bot(command_prefix='-', description=description)
+    # Log in for requests from the event loop on the same executor as every other blocking call.
+    asheets.set_executor(executor)
+    # Create the scheduler for the configured tasks.
+    schedule = scheduler.Scheduler(get_schedule(), run_scheduled)
+    schedule_started = []
 
     # Define bot events.
     @bot.event
@@ -114,77 +471,47 @@ def main():
         print(bot.user.name)
         print(bot.user.id)
         print('------')
-    
-    # When a user issues a join command, run add payee action.
-    @bot.command(description="Argument <full_name> must be surrounded by double quotes", help="Add a user to game server and billing", aliases=["j"])
-    async def join(ctx, full_name: str=None):
+        # Start the scheduler first, only once as this event runs again after reconnecting.
+        if len(schedule_started) == 0:
+            schedule_started.append(asyncio.ensure_future(schedule.run_forever()))
+            # Keep the local copy of the payee table in sync in the background.
+            schedule_started.append(asyncio.ensure_future(sync_ledger_forever()))
+            # Apply the jobs left from before the bot stopped, then any new ones.
+            jobs.restart()
+            job_state["wake"] = asyncio.Event()
+            schedule_started.append(asyncio.ensure_future(run_jobs_forever(bot)))
+            # Take tasks from runner.py so cronjobs do not need to start their own session.
+            schedule_started.append(await daemon.serve(daemon.get_path(config), run_scheduled))
+            # Serve the metrics for Prometheus if a port is configured.
+            metrics_cfg = config.get("metrics", {})
+            if "port" in metrics_cfg:
+                schedule_started.append(await metrics.serve(metrics_cfg.get("host", "127.0.0.1"), metrics_cfg["port"]))
+        # Open the Google Sheets session now so commands reuse it instead of authenticating each time.
         try:
-            # Continue if the role is correct.
-            if await check_role(ctx):
-                # Check args are correct data and display errors if not.
-                if full_name is None or full_name == "":
-                    await send_error(ctx, ["Payee name should not be empty!"])
-                elif any(char.isdigit() for char in full_name):
-                    await send_error(ctx, ["Payee name should not contain any numbers!"])
-                # Continue to action if args are correct data.
-                else:
-                    # Add reaction to the users message so they know the command is working.
-                    await add_react(ctx)
-                    # Create dictionary for payee.
-                    payee = {}
-                    payee["name"] = full_name
-
-                    # Run the add payee action.
-                    action.add_payee(payee)
-                    print ("Successfully added payee with details: " + str(payee))
-
-                    # Output the result to the Discord.
-                    msg_list = ["Successfully added `" + payee["name"] + "`"]
-                    await send_message(ctx, msg_list, discord.Color.green())
-        
-        except:
-            # Send an embeded error message, directing the user to the help command.
-            await send_default_error(ctx, "join")
-
-
-    # When a user issues a leave command, run remove payee action.
-    @bot.command(description="Argument <full_name> must be surrounded by double quotes", help="Remove a user from game server and billing", aliases=["l"])
-    async def leave(ctx, full_name: str=None):
-        try:
-            # Continue if the role is correct.
-            if await check_role(ctx):
-                # Check args are correct data and display errors if not.
-                if full_name is None or full_name == "":
-                    await send_error(ctx, ["Payee name should not be empty!"])
-                elif any(char.isdigit() for char in full_name):
-                    await send_error(ctx, ["Payee name should not contain any numbers!"])
-                # Continue to action if args are correct data.
-                else:
-                    # Add reaction to the users message so they know the command is working.
-                    await add_react(ctx)
-                    # Create dictionary for payee.
-                    payee = {}
-                    payee["name"] = full_name
-
-                    try:
-                        # Run the remove payee action.
-                        action.remove_payee(payee)
-                        print ("Successfully removed payee with details: " + str(payee))
-
-                        # Output the result to the Discord.
-                        msg_list = ["Successfully removed `" + payee["name"] + "`"]
-                        await send_message(ctx, msg_list, discord.Color.green())
+            await asyncio.get_running_loop().run_in_executor(executor, action.get_spreadsheet)
+        # If Google can not be reached, the first command opens the session instead.
+        except Exception as error:
+            print ("Could not open the Google Sheets session: " + repr(error))
+
+    # Time every command, so the calls each one makes are timed against it too.
+    @bot.before_invoke
+    async def start_timing(ctx):
+        ctx.timing = metrics.begin(ctx.command.name)
+
+    @bot.after_invoke
+    async def stop_timing(ctx):
+        metrics.end(ctx.timing)
+    
+    # When a user issues a join command, add each payee in one batch.
+    @bot.command(description="Each <full_name> must be surrounded by double quotes, or attach a csv with a name on each line", help="Add users to game server and billing", aliases=["j"])
+    async def join(ctx, *full_names: str):
+        await change_payees(ctx, "join", full_names)
 
-                    # If the remove payee action failed, display an error.
-                    except:
-                        print ("Could not find payee with details: " + str(payee))
 
-                        # Output the result to the Discord.
-                        await send_error(ctx, ["Could not find payee `" + full_name + "` in worksheet!"])
-            
-        except:
-            # Send an embeded error message, directing the user to the help command.
-            await send_default_error(ctx, "leave")
+    # When a user issues a leave command, remove each payee in one batch.
+    @bot.command(description="Each <full_name> must be surrounded by double quotes, or attach a csv with a name on each line", help="Remove users from game server and billing", aliases=["l"])
+    async def leave(ctx, *full_names: str):
+        await change_payees(ctx, "leave", full_names)
         
     
     # A command to update the whitelist.
@@ -208,6 +535,9 @@ def main():
                     await send_error(ctx, ["Payee name should not contain any numbers!"])
                 elif payee_id is None:
                     await send_error(ctx, ["Username / ID should not be empty!"])
+                # Check the payee exists from the local copy, when it is recent enough to trust.
+                elif ledger.is_synced() and not ledger.has_payee(action.to_camel_case(full_name)):
+                    await send_error(ctx, ["Could not find payee `" + action.to_camel_case(full_name) + "`"])
                 # Continue to action if args are correct data.
                 else:
                     # Add reaction to the users message so they know the command is working.
@@ -215,21 +545,8 @@ def main():
                     # Create dictionary for payee.
                     payee = {"name": full_name, "new_id": payee_id}
 
-                    try:
-                        # Run the action.
-                        action.update_whitelist(instruction, game, payee)
-                        print ("Payee ID updated for " + payee["name"] + ". " + game.capitalize() + ": " + payee["new_id"])
-
-                        # Output the result to the Discord.
-                        msg_list = ["Username / ID updated for `" + payee["name"] + "`"]
-                        await send_message(ctx, msg_list, discord.Color.green())
-
-                    # If the remove payee action failed, display an error.
-                    except:
-                        print ("Could not update whitelist for " + payee["name"])
-
-                        # Output the result to the Discord.
-                        await send_error(ctx, ["Could not update whitelist for `" + payee["name"] + "`"])
+                    # Queue the change as a job, replying now and editing the reply with the result.
+                    await queue_job(ctx, "whitelist", {"instruction": instruction, "game": game, "payee": payee}, "`whitelist " + instruction + "` for `" + full_name + "`")
             
         except:
             # Send an embeded error message, directing the user to the help command.
@@ -253,7 +570,7 @@ def main():
                     await add_react(ctx)
 
                     # Action the task and get the result.
-                    result = runner.main(task)
+                    result = await run_task(task)
 
                     # Output the result to the Discord.
                     if result[1] == True:
@@ -261,11 +578,112 @@ def main():
                     elif result[1] == False:
                         await send_message(ctx, [result[0]], discord.Color.red())
         
+        except asyncio.TimeoutError:
+            # Send an embeded error message, saying the command took too long.
+            await send_timeout_error(ctx, "run")
         except:
             # Send an embeded error message, directing the user to the help command.
             await send_default_error(ctx, "run")
 
 
+    # When a user issues a status command, show the state of this month's payments from the local copy.
+    @bot.command(description="Add --fresh to check the worksheet first", help="Show this month's payment status", aliases=["st"])
+    async def status(ctx, *options: str):
+        try:
+            # Continue if the role is correct.
+            if await check_role(ctx):
+                footer = await get_ledger("status", options)
+                payees = ledger.get_payees()
+                paid_no = len([payee for payee in payees if payee["status"] == paid_status])
+
+                # Output the result to the Discord.
+                lines = [
+                    "Payment: `" + str(ledger.get_value("Cost per payee")) + "` by `" + str(ledger.get_value("Payment date")) + "`",
+                    "Fully paid: `" + str(ledger.get_value("Fully paid?")) + "`",
+                    "Payees: `" + str(len(payees)) + "`, paid `" + str(paid_no) + "`, unpaid `" + str(len(payees) - paid_no) + "`"
+                ]
+                await send_pages(ctx, make_pages("Payment Status", lines, discord.Color.blue(), footer))
+
+        except asyncio.TimeoutError:
+            # Send an embeded error message, saying the command took too long.
+            await send_timeout_error(ctx, "status")
+        except:
+            # Send an embeded error message, directing the user to the help command.
+            await send_default_error(ctx, "status")
+
+
+    # When a user issues an unpaid command, list the payees who have not paid from the local copy.
+    @bot.command(description="Add --fresh to check the worksheet first", help="List the payees who have not paid this month", aliases=["u"])
+    async def unpaid(ctx, *options: str):
+        try:
+            # Continue if the role is correct.
+            if await check_role(ctx):
+                footer = await get_ledger("unpaid", options)
+                payees = ledger.get_payees()
+                unpaid_payees = [payee for payee in payees if payee["status"] != paid_status]
+
+                # Output the result to the Discord.
+                lines = ["`" + payee["name"] + "` " + payee["status"] for payee in unpaid_payees]
+                if len(lines) == 0:
+                    lines = ["Every payee has paid."]
+                title = "Unpaid Payees (" + str(len(unpaid_payees)) + " of " + str(len(payees)) + ")"
+                await send_pages(ctx, make_pages(title, lines, discord.Color.gold(), footer))
+
+        except asyncio.TimeoutError:
+            # Send an embeded error message, saying the command took too long.
+            await send_timeout_error(ctx, "unpaid")
+        except:
+            # Send an embeded error message, directing the user to the help command.
+            await send_default_error(ctx, "unpaid")
+
+
+    # When a user issues a roster command, list every payee and their IDs from the local copy.
+    @bot.command(description="Add --fresh to check the worksheet first", help="List every payee with their status and IDs", aliases=["ro"])
+    async def roster(ctx, *options: str):
+        try:
+            # Continue if the role is correct.
+            if await check_role(ctx):
+                footer = await get_ledger("roster", options)
+                payees = ledger.get_payees()
+
+                # Write a line for each payee, with the IDs they have.
+                lines = []
+                for payee in payees:
+                    ids = [game.capitalize() + " `" + value + "`" for game, value in sorted(payee["ids"].items()) if value != ""]
+                    lines.append(" ".join(["`" + payee["name"] + "`", payee["status"]] + ids))
+
+                # Output the result to the Discord.
+                await send_pages(ctx, make_pages("Roster (" + str(len(payees)) + ")", lines, discord.Color.blue(), footer))
+
+        except asyncio.TimeoutError:
+            # Send an embeded error message, saying the command took too long.
+            await send_timeout_error(ctx, "roster")
+        except:
+            # Send an embeded error message, directing the user to the help command.
+            await send_default_error(ctx, "roster")
+
+
+    # When a user issues a stats command, show how long commands and tasks have taken.
+    @bot.command(help="Show how long commands and tasks have taken, and where the time went", aliases=["s"])
+    async def stats(ctx):
+        try:
+            # Continue if the role is correct.
+            if await check_role(ctx):
+                # Get a line for each command and task run since the bot started.
+                lines = metrics.summary()
+                if len(lines) == 0:
+                    lines = ["No commands or tasks have run yet."]
+                # Show how many requests are waiting for the Google API budget.
+                lines.append("Google requests waiting for quota: `" + str(metrics.get_gauge("halogen_quota_waiting")) + "`")
+
+                # Output the result to the Discord.
+                await send_message(ctx, ["\n".join(lines)], discord.Color.blue())
+
+        except:
+            # Send an embeded error message, directing the user to the help command.
+            await send_default_error(ctx, "stats")
+
+
     # Run the bot.
     bot.run(get_cred(config["discord"]["token"]))
 
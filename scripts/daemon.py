@@ -0,0 +1,101 @@
+# Script which lets runner.py hand tasks to the running bot over a local socket.
+#
+# Part of a repository:
+# - https://github.com/kiweezi/halogen-pay
+# Created by:
+# - https://github.com/kiweezi
+#
+
+
+
+# Shebang
+#!/usr/bin/env python3
+
+# -- Imports --
+
+import os                                               # For handling file paths and sizes.
+import json                                             # For handling json files.
+import time                                             # For timing the tasks.
+import socket                                           # For connecting to the bot.
+
+# -- End --
+
+
+
+# -- Global Variables --
+
+# Default path of the socket, relative to the working directory.
+default_path = "halogen-pay.sock"
+# Seconds the runner waits for the bot to finish a task.
+default_timeout = 600
+
+# -- End --
+
+
+
+def get_path(config):
+    # Get the socket path from the bot config.
+    return os.path.abspath(config.get("bot", {}).get("socket", default_path))
+
+
+def send(path, command, timeout=default_timeout, names=None):
+    # Connect to the bot, raising an OSError if it is not running.
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    client.settimeout(timeout)
+    try:
+        client.connect(path)
+
+        # Send the command, and any payee names it is for, as a single line of json.
+        request = {"task": command}
+        if names is not None:
+            request["names"] = names
+        client.sendall((json.dumps(request) + "\n").encode())
+
+        # Read the reply until the end of the line.
+        reply = b""
+        while not reply.endswith(b"\n"):
+            chunk = client.recv(4096)
+            if not chunk:
+                break
+            reply += chunk
+    finally:
+        client.close()
+
+    # Return the result from the bot.
+    return json.loads(reply.decode())
+
+
+async def serve(path, run_task):
+    # For serving the socket from the bot's event loop.
+    import asyncio
+
+    async def handle(reader, writer):
+        # Read the command and run it through the bot.
+        start = time.monotonic()
+        request = {}
+        try:
+            request = json.loads((await reader.readline()).decode())
+            if "names" in request:
+                msg = await run_task(request["task"], request["names"])
+            else:
+                msg = await run_task(request["task"])
+        except asyncio.TimeoutError:
+            msg = ["Task `" + str(request.get("task")) + "` timed out in the bot!", False]
+        except Exception as error:
+            msg = ["Task could not be run by the bot: " + repr(error), False]
+
+        # Reply with the result and how long it took.
+        reply = {"msg": msg, "duration": round(time.monotonic() - start, 3)}
+        writer.write((json.dumps(reply) + "\n").encode())
+        await writer.drain()
+        writer.close()
+
+    # Remove a socket left behind by a previous run.
+    if os.path.exists(path):
+        os.remove(path)
+
+    # Listen on the socket, only allowing the current user to connect.
+    server = await asyncio.start_unix_server(handle, path=path)
+    os.chmod(path, 0o600)
+    print ("Listening for tasks on " + path)
+    return server
@@ -0,0 +1,183 @@
+# Script which keeps the changes asked for by bot commands on disk until they are applied, so they survive a restart.
+#
+# Part of a repository:
+# - https://github.com/kiweezi/halogen-pay
+# Created by:
+# - https://github.com/kiweezi
+#
+
+
+
+# Shebang
+#!/usr/bin/env python3
+
+# -- Imports --
+
+import os                                               # For handling file paths.
+import json                                             # For storing the arguments of each job.
+import time                                             # For when each job is due.
+import sqlite3                                          # For the jobs on disk.
+import threading                                        # For sharing the connection between threads.
+from settings import config                             # For the shared, cached config.
+
+# -- End --
+
+
+
+# -- Global Variables --
+
+# Default settings, used for anything missing from the `jobs` section of the config.
+defaults = {
+    "path": "config/jobs.db",
+    "retries": 5,
+    "backoff": 5,
+    "max_backoff": 300,
+    "keep": 604800
+}
+# Table of jobs, in the order they were asked for.
+# A job is `new` until its reply is sent, `pending` until it is applied, then `done` or `failed`.
+schema = """CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    args TEXT NOT NULL,
+    status TEXT NOT NULL,
+    channel INTEGER,
+    message INTEGER,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    due REAL NOT NULL,
+    error TEXT,
+    result TEXT,
+    created REAL NOT NULL
+)"""
+# Columns of a job, in the order they are read.
+columns = ["id", "kind", "args", "status", "channel", "message", "attempts", "due", "error", "result", "created"]
+# Store the open connection and the file it is for.
+state = {"connection": None, "path": None}
+lock = threading.RLock()
+
+# -- End --
+
+
+
+def get_setting(key):
+    # Get a setting from the config, falling back to the default.
+    return config.get("jobs", {}).get(key, defaults[key])
+
+
+def connect():
+    # Open the jobs file the first time it is needed, or again if the config now names another file.
+    path = os.path.abspath(get_setting("path"))
+    with lock:
+        if state["connection"] is None or state["path"] != path:
+            if state["connection"] is not None:
+                state["connection"].close()
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            connection = sqlite3.connect(path, check_same_thread=False)
+            connection.execute(schema)
+            connection.commit()
+            state["connection"] = connection
+            state["path"] = path
+
+        # Return the connection.
+        return state["connection"]
+
+
+def execute(statement, parameters=()):
+    # Run a statement which changes the jobs, committing it straight away.
+    with lock:
+        connection = connect()
+        with connection:
+            return connection.execute(statement, parameters)
+
+
+def to_job(row):
+    # Turn a row of the table into a job.
+    job = dict(zip(columns, row))
+    job["args"] = json.loads(job["args"])
+    job["result"] = None if job["result"] is None else json.loads(job["result"])
+    return job
+
+
+def add(kind, args):
+    # Store a new job, which waits for its reply before it is applied.
+    now = time.time()
+    cursor = execute("INSERT INTO jobs (kind, args, status, due, created) VALUES (?, ?, 'new', ?, ?)", (kind, json.dumps(args), now, now))
+
+    # Return the id of the job.
+    return cursor.lastrowid
+
+
+def set_reply(job_id, channel_id, message_id):
+    # Store the reply to edit with the result, and let the job be applied.
+    execute("UPDATE jobs SET channel = ?, message = ?, status = 'pending' WHERE id = ?", (channel_id, message_id, job_id))
+
+
+def get(job_id):
+    # Get a job by its id, or none if there is no such job.
+    with lock:
+        row = connect().execute("SELECT " + ", ".join(columns) + " FROM jobs WHERE id = ?", (job_id,)).fetchone()
+    return None if row is None else to_job(row)
+
+
+def count_pending():
+    # Count the jobs which have not been applied yet.
+    with lock:
+        return connect().execute("SELECT COUNT(*) FROM jobs WHERE status IN ('new', 'pending')").fetchone()[0]
+
+
+def get_ready(merge_kinds, limit=100):
+    # Get the oldest pending job, and how long until it is due if it is waiting to retry.
+    with lock:
+        rows = connect().execute("SELECT " + ", ".join(columns) + " FROM jobs WHERE status = 'pending' ORDER BY id LIMIT ?", (limit,)).fetchall()
+    if len(rows) == 0:
+        return [], None
+    pending = [to_job(row) for row in rows]
+    wait = pending[0]["due"] - time.time()
+    if wait > 0:
+        return [], wait
+
+    # Take any due jobs of the same kinds directly behind it too, so they can be applied together.
+    ready = [pending[0]]
+    if pending[0]["kind"] in merge_kinds:
+        for job in pending[1:]:
+            if job["kind"] not in merge_kinds or job["due"] > time.time():
+                break
+            ready.append(job)
+
+    # Return the jobs ready to apply.
+    return ready, 0
+
+
+def start(job):
+    # Count an attempt before the job is applied, so an attempt cut short by a restart is still known about.
+    execute("UPDATE jobs SET attempts = attempts + 1 WHERE id = ?", (job["id"],))
+    job["attempts"] += 1
+
+    # Return whether the job may have been applied by an earlier attempt.
+    return job["attempts"] > 1
+
+
+def get_delay(attempts):
+    # Wait longer after each failed attempt, up to a limit.
+    return min(get_setting("max_backoff"), get_setting("backoff") * (2 ** (attempts - 1)))
+
+
+def retry(job, error):
+    # Put the job off until it is tried again, after the attempt counted when it was started.
+    attempts = job["attempts"]
+    delay = get_delay(attempts)
+    execute("UPDATE jobs SET due = ?, error = ? WHERE id = ?", (time.time() + delay, error, job["id"]))
+
+    # Return the attempts so far and the delay.
+    return attempts, delay
+
+
+def finish(job, status, result):
+    # Store the final result of a job.
+    execute("UPDATE jobs SET status = ?, result = ? WHERE id = ?", (status, json.dumps(result), job["id"]))
+
+
+def restart():
+    # Apply jobs whose reply was never sent before the last stop, and forget old finished jobs.
+    execute("UPDATE jobs SET status = 'pending' WHERE status = 'new'")
+    execute("DELETE FROM jobs WHERE status IN ('done', 'failed') AND created < ?", (time.time() - get_setting("keep"),))
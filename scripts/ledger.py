@@ -0,0 +1,215 @@
+# Script which keeps a local SQLite copy of the payee table, so lookups are answered without waiting on Google.
+#
+# Part of a repository:
+# - https://github.com/kiweezi/halogen-pay
+# Created by:
+# - https://github.com/kiweezi
+#
+
+
+
+# Shebang
+#!/usr/bin/env python3
+
+# -- Imports --
+
+import os                                               # For handling file paths.
+import json                                             # For storing each payee's IDs.
+import time                                             # For knowing how old the copy is.
+import threading                                        # For sharing the connection between threads.
+from settings import config                             # For the shared, cached config.
+
+# -- End --
+
+
+
+# -- Global Variables --
+
+# Default settings, used for anything missing from the `ledger` section of the config.
+defaults = {
+    "path": "config/ledger.db",
+    "interval": 60
+}
+# Headers of the worksheet values kept alongside the payees.
+summary_headers = ["Cost per payee", "Payment date", "Fully paid?"]
+# Tables of the local copy.
+schema = [
+    "CREATE TABLE IF NOT EXISTS payees (name TEXT PRIMARY KEY, status TEXT NOT NULL, ids TEXT NOT NULL, hash TEXT NOT NULL)",
+    "CREATE TABLE IF NOT EXISTS summary (header TEXT PRIMARY KEY, value TEXT NOT NULL)",
+    "CREATE TABLE IF NOT EXISTS sync (key TEXT PRIMARY KEY, value TEXT NOT NULL)"
+]
+# Store the open connection and the file it is for.
+state = {"connection": None, "path": None}
+lock = threading.RLock()
+
+# -- End --
+
+
+
+def get_setting(key):
+    # Get a setting from the config, falling back to the default.
+    return config.get("ledger", {}).get(key, defaults[key])
+
+
+def connect():
+    # For the local copy, only loaded once it is used.
+    import sqlite3
+
+    # Open the local copy the first time it is needed, or again if the config now names another file.
+    path = os.path.abspath(get_setting("path"))
+    with lock:
+        if state["connection"] is None or state["path"] != path:
+            if state["connection"] is not None:
+                state["connection"].close()
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            connection = sqlite3.connect(path, check_same_thread=False)
+            # Start the payees again if the copy is from before rows were hashed, as it is only a copy.
+            columns = [row[1] for row in connection.execute("PRAGMA table_info(payees)")]
+            if len(columns) > 0 and "hash" not in columns:
+                connection.execute("DROP TABLE payees")
+                connection.execute("DELETE FROM sync")
+            for statement in schema:
+                connection.execute(statement)
+            connection.commit()
+            state["connection"] = connection
+            state["path"] = path
+
+        # Return the connection.
+        return state["connection"]
+
+
+def get_ids(snapshot, row_no):
+    # Get the payee's ID for each game collumn, keyed by the game in lower case.
+    ids = {}
+    for header, col_no in snapshot.columns.items():
+        if header.endswith(" ID"):
+            ids[header[:-len(" ID")].lower()] = snapshot.cell(row_no, col_no)
+
+    # Return the IDs.
+    return ids
+
+
+def get_hash(values):
+    # For summing up rows, only loaded once a worksheet is synced.
+    import hashlib
+
+    # Sum up a row of the worksheet, so a changed row can be found without comparing every cell.
+    return hashlib.sha1(json.dumps(values).encode("utf-8")).hexdigest()
+
+
+def store(snapshot, revision=""):
+    # Get each payee's status, IDs and row hash from a worksheet read.
+    payees = {}
+    status_col = snapshot.columns.get("Status")
+    for name, row_no in snapshot.names.items():
+        status = "" if status_col is None else snapshot.cell(row_no, status_col)
+        payees[name] = (name, status, json.dumps(get_ids(snapshot, row_no)), get_hash(snapshot.row(row_no)))
+    # Get the summary values and when they were read.
+    summary = [(header, snapshot.value_below(header)) for header in summary_headers if header in snapshot.index]
+    sync = [("worksheet", snapshot.worksheet.title), ("worksheet_id", str(snapshot.worksheet.id)), ("revision", revision), ("synced", str(time.time()))]
+
+    # Change only the payees whose rows changed, in one transaction so lookups never see half a copy.
+    with lock:
+        connection = connect()
+        hashes = dict(connection.execute("SELECT name, hash FROM payees").fetchall())
+        changed = [payee for name, payee in payees.items() if hashes.get(name) != payee[3]]
+        removed = [(name,) for name in hashes if name not in payees]
+        with connection:
+            connection.executemany("INSERT OR REPLACE INTO payees VALUES (?, ?, ?, ?)", changed)
+            connection.executemany("DELETE FROM payees WHERE name = ?", removed)
+            connection.execute("DELETE FROM summary")
+            connection.executemany("INSERT INTO summary VALUES (?, ?)", summary)
+            connection.executemany("INSERT OR REPLACE INTO sync VALUES (?, ?)", sync)
+
+    # Return how many payees changed and were removed.
+    return len(changed), len(removed)
+
+
+def touch():
+    # Mark the copy as current without changing it, when the spreadsheet has not changed since it was made.
+    with lock:
+        connection = connect()
+        with connection:
+            connection.execute("INSERT OR REPLACE INTO sync VALUES ('synced', ?)", (str(time.time()),))
+
+
+def add_payee(payee):
+    # Add a payee just written to the worksheet.
+    with lock:
+        connection = connect()
+        with connection:
+            # Leave the hash empty so the next sync fills in the rest of the row.
+            connection.execute("INSERT OR REPLACE INTO payees VALUES (?, ?, ?, '')", (payee["name"], payee.get("status", ""), json.dumps({})))
+
+
+def remove_payee(name):
+    # Remove a payee just deleted from the worksheet.
+    with lock:
+        connection = connect()
+        with connection:
+            connection.execute("DELETE FROM payees WHERE name = ?", (name,))
+
+
+def set_id(name, game, value):
+    # Change a payee's ID for a game, just written to the worksheet.
+    with lock:
+        payee = get_payee(name)
+        if payee is None:
+            return
+        payee["ids"][game] = value
+        connection = connect()
+        with connection:
+            connection.execute("UPDATE payees SET ids = ?, hash = '' WHERE name = ?", (json.dumps(payee["ids"]), name))
+
+
+def clear():
+    # Forget the local copy, so nothing is answered from it until the next sync.
+    with lock:
+        connection = connect()
+        with connection:
+            connection.execute("DELETE FROM sync WHERE key IN ('synced', 'revision')")
+
+
+def get_sync(key):
+    # Get a value stored about the last sync, or none if there has not been one.
+    with lock:
+        row = connect().execute("SELECT value FROM sync WHERE key = ?", (key,)).fetchone()
+    return None if row is None else row[0]
+
+
+def is_synced():
+    # The copy can be trusted if it was synced within two sync intervals.
+    synced = get_sync("synced")
+    return synced is not None and time.time() - float(synced) < 2 * get_setting("interval")
+
+
+def has_payee(name):
+    # Check if a payee is in the local copy.
+    with lock:
+        return connect().execute("SELECT 1 FROM payees WHERE name = ?", (name,)).fetchone() is not None
+
+
+def to_payee(row):
+    # Turn a row of the local copy into a payee.
+    return {"name": row[0], "status": row[1], "ids": json.loads(row[2])}
+
+
+def get_payee(name):
+    # Get a payee from the local copy, or none if they are not in it.
+    with lock:
+        row = connect().execute("SELECT name, status, ids FROM payees WHERE name = ?", (name,)).fetchone()
+    return None if row is None else to_payee(row)
+
+
+def get_payees():
+    # Get every payee from the local copy, in the sorted order of the worksheet.
+    with lock:
+        rows = connect().execute("SELECT name, status, ids FROM payees ORDER BY name").fetchall()
+    return [to_payee(row) for row in rows]
+
+
+def get_value(header):
+    # Get a summary value from the local copy, or none if it is not in it.
+    with lock:
+        row = connect().execute("SELECT value FROM summary WHERE header = ?", (header,)).fetchone()
+    return None if row is None else row[0]
@@ -0,0 +1,225 @@
+# Script which records how long commands and tasks take, and how much of that is spent waiting on other services.
+#
+# Part of a repository:
+# - https://github.com/kiweezi/halogen-pay
+# Created by:
+# - https://github.com/kiweezi
+#
+
+
+
+# Shebang
+#!/usr/bin/env python3
+
+# -- Imports --
+
+import time                                             # For timing operations and calls.
+import bisect                                           # For finding the bucket of a timing.
+import threading                                        # For sharing the metrics between threads.
+import contextlib                                       # For timing blocks of code.
+import contextvars                                      # For knowing which command a call was made for.
+from collections import deque                           # For the recent timings of each operation.
+
+# -- End --
+
+
+
+# -- Global Variables --
+
+# Upper bounds of the timing buckets, in seconds.
+buckets = [0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300]
+# Number of recent timings kept for each operation, to work out percentiles.
+recent_size = 500
+# Descriptions of each metric, in the order they are shown.
+descriptions = {
+    "halogen_operation_seconds": ("histogram", "Time taken by each command and task."),
+    "halogen_operation_errors_total": ("counter", "Commands and tasks which failed or replied with an error."),
+    "halogen_external_seconds": ("histogram", "Time spent waiting on each external service, by the command or task it was for."),
+    "halogen_external_errors_total": ("counter", "Calls to external services which failed."),
+    "halogen_external_retries_total": ("counter", "Calls to external services which were retried."),
+    "halogen_quota_wait_seconds": ("histogram", "Time spent waiting for the Google API budget, by the command or task it was for."),
+    "halogen_quota_waiting": ("gauge", "Requests to Google waiting for the budget right now.")
+}
+# The command or task being run, which carries over to the threads it uses.
+operation = contextvars.ContextVar("operation", default="other")
+# Store the histograms, counters, gauges and recent timings.
+state = {"histograms": {}, "counters": {}, "gauges": {}, "recent": {}}
+lock = threading.Lock()
+
+# -- End --
+
+
+
+def observe(name, labels, seconds):
+    # Add a timing to a histogram.
+    with lock:
+        series = state["histograms"].setdefault(name, {}).setdefault(labels, {"buckets": [0] * len(buckets), "sum": 0.0, "count": 0})
+        index = bisect.bisect_left(buckets, seconds)
+        if index < len(buckets):
+            series["buckets"][index] += 1
+        series["sum"] += seconds
+        series["count"] += 1
+
+        # Keep the recent timings of each operation for the stats command.
+        if name == "halogen_operation_seconds":
+            state["recent"].setdefault(labels, deque(maxlen=recent_size)).append(seconds)
+
+
+def count(name, labels):
+    # Add one to a counter.
+    with lock:
+        series = state["counters"].setdefault(name, {})
+        series[labels] = series.get(labels, 0) + 1
+
+
+def set_gauge(name, labels, value):
+    # Set a value which can go up and down.
+    with lock:
+        state["gauges"].setdefault(name, {})[labels] = value
+
+
+def get_gauge(name, labels=()):
+    # Get a value which can go up and down, zero if it has not been set.
+    with lock:
+        return state["gauges"].get(name, {}).get(labels, 0)
+
+
+def add_error():
+    # Count an error against the current operation.
+    count("halogen_operation_errors_total", (("operation", operation.get()),))
+
+
+def add_retry(api):
+    # Count a retried call to an external service.
+    count("halogen_external_retries_total", (("operation", operation.get()), ("api", api)))
+
+
+def begin(name):
+    # Start timing a command or task, and let every call made for it know which one it is.
+    return {"name": name, "token": operation.set(name), "start": time.perf_counter()}
+
+
+def end(timing):
+    # Stop timing a command or task.
+    observe("halogen_operation_seconds", (("operation", timing["name"]),), time.perf_counter() - timing["start"])
+    operation.reset(timing["token"])
+
+
+@contextlib.contextmanager
+def track(name):
+    # Time a block of code as a command or task, counting it as an error if it raises.
+    timing = begin(name)
+    try:
+        yield
+    except BaseException:
+        add_error()
+        raise
+    finally:
+        end(timing)
+
+
+@contextlib.contextmanager
+def external(api):
+    # Time a call to an external service, counting it if it fails.
+    labels = (("operation", operation.get()), ("api", api))
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        count("halogen_external_errors_total", labels)
+        raise
+    finally:
+        observe("halogen_external_seconds", labels, time.perf_counter() - start)
+
+
+def format_labels(labels, extra=()):
+    # Write labels the way Prometheus reads them.
+    pairs = []
+    for key, value in labels + extra:
+        value = str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+        pairs.append(key + "=\"" + value + "\"")
+    return "{" + ",".join(pairs) + "}"
+
+
+def render():
+    # Write every metric in the Prometheus text format.
+    lines = []
+    with lock:
+        for name, (kind, description) in descriptions.items():
+            lines.append("# HELP " + name + " " + description)
+            lines.append("# TYPE " + name + " " + kind)
+            if kind in ["counter", "gauge"]:
+                for labels, value in sorted(state[kind + "s"].get(name, {}).items()):
+                    lines.append(name + format_labels(labels) + " " + str(value))
+                continue
+
+            # Histogram buckets count every timing at or below their bound.
+            for labels, series in sorted(state["histograms"].get(name, {}).items()):
+                total = 0
+                for bound, value in zip(buckets, series["buckets"]):
+                    total += value
+                    lines.append(name + "_bucket" + format_labels(labels, (("le", bound),)) + " " + str(total))
+                lines.append(name + "_bucket" + format_labels(labels, (("le", "+Inf"),)) + " " + str(series["count"]))
+                lines.append(name + "_sum" + format_labels(labels) + " " + str(round(series["sum"], 6)))
+                lines.append(name + "_count" + format_labels(labels) + " " + str(series["count"]))
+
+    # Return the text.
+    return "\n".join(lines) + "\n"
+
+
+def percentile(timings, fraction):
+    # Get the timing which the given fraction of timings are at or below.
+    ordered = sorted(timings)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def summary():
+    # Describe the latency of each operation and where its time went, one line each.
+    lines = []
+    with lock:
+        errors = state["counters"].get("halogen_operation_errors_total", {})
+        external_series = state["histograms"].get("halogen_external_seconds", {})
+        for labels, timings in sorted(state["recent"].items()):
+            name = dict(labels)["operation"]
+            runs = state["histograms"]["halogen_operation_seconds"][labels]["count"]
+            line = "`" + name + "` " + str(runs) + " runs, p50 `" + str(round(percentile(timings, 0.5), 2)) + "s`, p95 `" + str(round(percentile(timings, 0.95), 2)) + "s`, " + str(errors.get(labels, 0)) + " errors"
+
+            # Add the average time each run spent on each external service.
+            waits = []
+            for external_labels, series in sorted(external_series.items()):
+                external_dict = dict(external_labels)
+                if external_dict["operation"] == name:
+                    waits.append(external_dict["api"] + " `" + str(round(series["sum"] / runs, 2)) + "s` over " + str(series["count"]) + " calls")
+            if len(waits) > 0:
+                line += "\n    " + ", ".join(waits)
+            lines.append(line)
+
+    # Return the lines.
+    return lines
+
+
+async def serve(host, port):
+    # Answer `GET /metrics` on a local port for Prometheus, only loaded by the bot.
+    import asyncio
+
+    async def handle(reader, writer):
+        try:
+            # Read the request line, then skip the headers.
+            request_line = (await reader.readline()).decode("latin-1").split()
+            while (await reader.readline()).strip() != b"":
+                pass
+
+            # Send the metrics, or not found for anything else.
+            if len(request_line) >= 2 and request_line[0] == "GET" and request_line[1].split("?")[0] == "/metrics":
+                status, body = "200 OK", render().encode("utf-8")
+            else:
+                status, body = "404 Not Found", b"Not found.\n"
+            writer.write(("HTTP/1.1 " + status + "\r\nContent-Type: text/plain; version=0.0.4; charset=utf-8\r\nContent-Length: " + str(len(body)) + "\r\nConnection: close\r\n\r\n").encode("latin-1") + body)
+            await writer.drain()
+        finally:
+            writer.close()
+
+    # Start the server and return it.
+    server = await asyncio.start_server(handle, host, port)
+    print ("Serving metrics on http://" + host + ":" + str(port) + "/metrics")
+    return server
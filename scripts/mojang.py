@@ -0,0 +1,162 @@
+# Script which looks up Minecraft player UUIDs from Mojang's API, with a cache kept on disk.
+#
+# Part of a repository:
+# - https://github.com/kiweezi/halogen-pay
+# Created by:
+# - https://github.com/kiweezi
+#
+
+
+
+# Shebang
+#!/usr/bin/env python3
+
+# -- Imports --
+
+import os                                               # For handling file paths and sizes.
+import json                                             # For handling json files.
+import time                                             # For the age of cached players.
+import threading                                        # For sharing lookups between threads.
+from concurrent.futures import Future                   # For waiting on a lookup already being made.
+import metrics                                          # For timing requests to Mojang.
+from settings import config                             # For the shared, cached config.
+
+# -- End --
+
+
+
+# -- Global Variables --
+
+# Default settings, used for anything missing from the `mojang` section of the config.
+defaults = {
+    "url": "https://api.mojang.com/profiles/minecraft",
+    "cache": "config/mojang_cache.json",
+    "ttl": 30 * 24 * 60 * 60,
+    "timeout": 10
+}
+# Most names Mojang accepts in a single bulk lookup.
+batch_size = 10
+# Headers sent with every request.
+headers = {"User-Agent": "halogen-pay", "Content-Type": "application/json"}
+# Store the cache, the lookups being made and the HTTP session.
+state = {"cache": None, "session": None}
+inflight = {}
+lock = threading.Lock()
+
+# -- End --
+
+
+
+def get_setting(key):
+    # Get a setting from the config, falling back to the default.
+    return config.get("mojang", {}).get(key, defaults[key])
+
+
+def format_uuid(uuid):
+    # Add the dashes Minecraft expects in a whitelist.
+    u = uuid.replace("-", "")
+    return "-".join((u[0:8], u[8:12], u[12:16], u[16:20], u[20:]))
+
+
+def get_session():
+    # For requests to the API, only loaded when a player needs looking up.
+    import requests
+
+    # Reuse one session so connections to the API are pooled.
+    if state["session"] is None:
+        state["session"] = requests.Session()
+        state["session"].headers.update(headers)
+    return state["session"]
+
+
+def load_cache():
+    # Load the cache from disk the first time it is needed.
+    if state["cache"] is None:
+        try:
+            with open(get_setting("cache")) as json_file:
+                state["cache"] = json.load(json_file)
+        except (OSError, ValueError):
+            state["cache"] = {}
+    return state["cache"]
+
+
+def save_cache():
+    # Write the cache to a temporary file, then replace the old one so it is never half written.
+    path = get_setting("cache")
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path + ".tmp", "w") as json_file:
+        json.dump(state["cache"], json_file, indent=4)
+    os.replace(path + ".tmp", path)
+
+
+def get_cached(name):
+    # Get a cached UUID if it has not expired.
+    entry = load_cache().get(name.lower())
+    if entry is not None and time.time() - entry["time"] < get_setting("ttl"):
+        return entry["uuid"]
+    return None
+
+
+def fetch(names):
+    # Look up to ten names in one request to Mojang's bulk profile endpoint.
+    with metrics.external("mojang"):
+        response = get_session().post(get_setting("url"), data=json.dumps(names), timeout=get_setting("timeout"))
+        response.raise_for_status()
+
+    # Return the UUIDs by lower case name, as Minecraft names ignore case.
+    return {profile["name"].lower(): format_uuid(profile["id"]) for profile in response.json()}
+
+
+def lookup(names):
+    # Work out which names are cached, already being looked up, or need looking up.
+    results = {}
+    waiting = {}
+    missing = []
+    with lock:
+        for name in set(name.lower() for name in names):
+            uuid = get_cached(name)
+            if uuid is not None:
+                results[name] = uuid
+            elif name in inflight:
+                waiting[name] = inflight[name]
+            else:
+                inflight[name] = Future()
+                missing.append(name)
+
+    # Look up the missing names in batches.
+    if len(missing) > 0:
+        found = {}
+        try:
+            for index in range(0, len(missing), batch_size):
+                found.update(fetch(missing[index:(index + batch_size)]))
+        except Exception as error:
+            # Let any thread waiting on these names see the error too.
+            with lock:
+                for name in missing:
+                    inflight.pop(name).set_exception(error)
+            raise
+
+        # Store the results and save the cache once.
+        with lock:
+            for name in missing:
+                uuid = found.get(name)
+                if uuid is not None:
+                    state["cache"][name] = {"uuid": uuid, "time": time.time()}
+                inflight.pop(name).set_result(uuid)
+                results[name] = uuid
+            save_cache()
+
+    # Wait for names another thread was already looking up.
+    for name, future in waiting.items():
+        results[name] = future.result()
+
+    # Return the UUID of each name, or none if the player does not exist.
+    return {name: results[name.lower()] for name in names}
+
+
+def get_uuid(name):
+    # Look up a single player, raising an error if they do not exist.
+    uuid = lookup([name])[name]
+    if uuid is None:
+        raise KeyError("Minecraft player `" + name + "` could not be found.")
+    return uuid
@@ -0,0 +1,137 @@
+# Script which orders the changes made to the spreadsheet and merges waiting joins and leaves.
+#
+# Part of a repository:
+# - https://github.com/kiweezi/halogen-pay
+# Created by:
+# - https://github.com/kiweezi
+#
+
+
+
+# Shebang
+#!/usr/bin/env python3
+
+# -- Imports --
+
+import threading                                        # For the worker that applies the changes.
+import contextvars                                      # For timing changes against the command that made them.
+from collections import deque                           # For the queue of waiting changes.
+from concurrent.futures import Future                   # For reporting results back to the caller.
+import action                                           # Action script to impliment changes.
+from settings import config                             # For the shared, cached config.
+
+# -- End --
+
+
+
+# -- Global Variables --
+
+# Kinds of change that can be merged into one batch.
+payee_kinds = ["join", "leave"]
+# Store one queue per spreadsheet.
+queues = {}
+queues_lock = threading.Lock()
+
+# -- End --
+
+
+
+class MutationQueue:
+    # Applies changes to one spreadsheet one after another, in the order they were submitted.
+
+    def __init__(self, name):
+        # Store the waiting changes and start the worker.
+        self.name = name
+        self.pending = deque()
+        self.condition = threading.Condition()
+        self.thread = threading.Thread(target=self.work, name=("mutations-" + name), daemon=True)
+        self.thread.start()
+
+
+    def submit(self, kind, *args):
+        # Add a change to the queue and return a future for its result, along with the command it was made for.
+        return self.submit_all([(kind, args)])[0]
+
+    def submit_all(self, changes):
+        # Add several changes at once, so the worker sees them together, and return a future for each.
+        futures = []
+        context = contextvars.copy_context()
+        with self.condition:
+            for kind, args in changes:
+                future = Future()
+                self.pending.append((kind, args, future, context))
+                futures.append(future)
+            self.condition.notify()
+        return futures
+
+    def submit_payees(self, instruction, payees):
+        # Queue many joins or leaves together, so they are applied in one batch.
+        return self.submit_all([(instruction, (payee,)) for payee in payees])
+
+    def submit_call(self, func, *args):
+        # Queue any other change to the spreadsheet, which runs on its own.
+        return self.submit("call", func, *args)
+
+
+    def take(self):
+        # Wait for the next change.
+        with self.condition:
+            while len(self.pending) == 0:
+                self.condition.wait()
+            items = [self.pending.popleft()]
+
+            # Merge every join and leave waiting directly behind a join or leave.
+            if items[0][0] in payee_kinds:
+                while len(self.pending) > 0 and self.pending[0][0] in payee_kinds:
+                    items.append(self.pending.popleft())
+
+        # Drop any changes the caller has stopped waiting for.
+        return [item for item in items if item[2].set_running_or_notify_cancel()]
+
+    def apply(self, items):
+        # Apply a batch of joins and leaves with a single read and write.
+        if items[0][0] in payee_kinds:
+            changes = [{"instruction": kind, "payee": args[0]} for kind, args, future, context in items]
+            try:
+                # Time the batch against the command of the first change.
+                results = items[0][3].run(action.update_payees, changes)
+            except Exception as error:
+                results = [error] * len(items)
+            if len(items) > 1:
+                print ("Merged " + str(len(items)) + " payee changes into one batch.")
+
+            # Report the result of each change to its caller.
+            for (kind, args, future, context), result in zip(items, results):
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+
+        # Apply any other change on its own.
+        else:
+            kind, args, future, context = items[0]
+            try:
+                future.set_result(context.run(args[0], *args[1:]))
+            except Exception as error:
+                future.set_exception(error)
+
+    def work(self):
+        # Apply changes for as long as the process runs.
+        while True:
+            items = self.take()
+            if len(items) > 0:
+                self.apply(items)
+
+
+def get_queue(name=None):
+    # Use the configured spreadsheet when no name is given.
+    if name is None:
+        name = config["gsheets"]["spreadsheet"]
+
+    # Create the queue for the spreadsheet the first time it is needed.
+    with queues_lock:
+        if name not in queues:
+            queues[name] = MutationQueue(name)
+
+        # Return the queue.
+        return queues[name]
@@ -0,0 +1,138 @@
+# Script which paces requests to Google within a budget, and backs off when Google is rate limiting or overloaded.
+#
+# Part of a repository:
+# - https://github.com/kiweezi/halogen-pay
+# Created by:
+# - https://github.com/kiweezi
+#
+
+
+
+# Shebang
+#!/usr/bin/env python3
+
+# -- Imports --
+
+import time                                             # For pacing and backing off.
+import random                                           # For spreading out retries.
+import threading                                        # For sharing the budget between threads.
+import metrics                                          # For timing requests and counting retries.
+from settings import config                             # For the shared, cached config.
+
+# -- End --
+
+
+
+# -- Global Variables --
+
+# Default settings, used for anything missing from the `quota` section of the config.
+defaults = {
+    "per_minute": 60,
+    "burst": 10,
+    "retries": 5,
+    "backoff": 1,
+    "max_backoff": 32
+}
+# Store the tokens left in the bucket, when it was last filled and how many requests are waiting.
+state = {"tokens": None, "updated": 0, "waiting": 0}
+lock = threading.Lock()
+
+# -- End --
+
+
+
+def get_setting(key):
+    # Get a setting from the config, falling back to the default.
+    return config.get("quota", {}).get(key, defaults[key])
+
+
+def set_waiting(change):
+    # Count the requests waiting for the budget, and show it in the metrics.
+    with lock:
+        state["waiting"] += change
+        waiting = state["waiting"]
+    metrics.set_gauge("halogen_quota_waiting", (), waiting)
+
+
+def take_token():
+    # Fill the bucket for the time since it was last filled, up to the burst size.
+    now = time.monotonic()
+    burst = get_setting("burst")
+    with lock:
+        if state["tokens"] is None:
+            state["tokens"] = burst
+        else:
+            state["tokens"] = min(burst, state["tokens"] + (now - state["updated"]) * get_setting("per_minute") / 60)
+        state["updated"] = now
+
+        # Take a token if there is one, otherwise say how long until there will be.
+        if state["tokens"] >= 1:
+            state["tokens"] -= 1
+            return 0
+        return (1 - state["tokens"]) * 60 / get_setting("per_minute")
+
+
+def acquire():
+    # Wait until the budget allows another request.
+    delay = take_token()
+    if delay == 0:
+        return
+
+    # Wait in turn with any other requests over the budget.
+    set_waiting(1)
+    start = time.perf_counter()
+    try:
+        while delay > 0:
+            time.sleep(delay)
+            delay = take_token()
+    finally:
+        set_waiting(-1)
+        metrics.observe("halogen_quota_wait_seconds", (("operation", metrics.operation.get()),), time.perf_counter() - start)
+
+
+def get_status(error):
+    # Get the HTTP status of a failed request, if it has one.
+    response = getattr(error, "response", None)
+    return getattr(response, "status_code", None)
+
+
+def is_retryable_status(status):
+    # Google asks for retries on rate limits and server errors.
+    return status is not None and (status == 429 or status >= 500)
+
+
+def is_retryable(error):
+    # Check if a failed request should be tried again.
+    return is_retryable_status(get_status(error))
+
+
+def get_backoff(attempt, retry_after=None):
+    # Wait as long as Google asks, if it says.
+    if retry_after is not None and retry_after.isdigit():
+        return float(retry_after)
+
+    # Otherwise wait a random time up to a limit which doubles each attempt, so waiting commands do not retry together.
+    return random.uniform(0, min(get_setting("max_backoff"), get_setting("backoff") * (2 ** attempt)))
+
+
+def get_delay(error, attempt):
+    # Get how long to wait before trying a failed request again.
+    return get_backoff(attempt, getattr(getattr(error, "response", None), "headers", {}).get("Retry-After"))
+
+
+def call(api, request, *args, **kwargs):
+    # Send a request within the budget, trying again while Google is rate limiting or overloaded.
+    attempt = 0
+    while True:
+        acquire()
+        try:
+            with metrics.external(api):
+                return request(*args, **kwargs)
+        except Exception as error:
+            if not is_retryable(error) or attempt >= get_setting("retries"):
+                raise
+            delay = get_delay(error, attempt)
+            print ("Google API returned " + str(get_status(error)) + ", retrying in " + str(round(delay, 1)) + "s.")
+            metrics.add_retry(api)
+            time.sleep(delay)
+            attempt += 1
@@ -13,10 +13,12 @@
 
 # -- Imports --
 
-import os                                               # For handling file paths and sizes.
+import io                                               # For reading csv text.
 import sys                                              # For arguments and script control.
-import json                                             # For handling json files.
-import action                                           # Action script to impliment changes.
+import csv                                              # For reading lists of names.
+import daemon                                           # For handing tasks to the running bot.
+import settings                                         # For checking when the config was reloaded.
+from settings import config                             # For the shared, cached config.
 
 # -- End --
 
@@ -24,44 +26,45 @@ import action                                           # Action script to impli
 
 # -- Global Variables --
 
-# Set the working directory.
-os.chdir(os.path.abspath(os.path.join(os.path.realpath(__file__), "../../")))
-# Set configuration file path.
-cfg_path = os.path.abspath("config/cfg.json")
-# Load the config file into the program.
-with open(cfg_path) as json_file:
-    config = json.load(json_file)
+# Map every task alias to its instruction, rebuilt when the config is reloaded.
+task_aliases = {"version": None, "aliases": {}}
+# Tasks which take a list of payee names, and what each one does to them.
+payee_tasks = {"join": "added", "leave": "removed"}
+# Tasks which write to the spreadsheet, so they wait their turn with joins and leaves.
+queued_tasks = ["update_worksheet", "reconcile"]
+# Headers a csv of names may start with.
+name_headers = ["name", "names", "payee", "payees", "full name", "full_name"]
 
 # -- End --
 
 
 
 def get_instruction(command):
-    # Define correct tasks.
-    tasks_list = config["tasks"]
-
-    # Check if the command is a valid task.
-    for task in tasks_list:
-        for alias in task:
-            # If the command matches an alias, return the instruction.
-            if command == alias:
-                return task[0]
-    
-    # If the command does not match an alias, return false.
-    return False
+    # Rebuild the alias map if the config has changed.
+    if task_aliases["version"] != settings.version():
+        task_aliases["aliases"] = {alias: task[0] for task in config["tasks"] for alias in task}
+        task_aliases["version"] = settings.version()
 
+    # If the command matches an alias, return the instruction, otherwise return false.
+    return task_aliases["aliases"].get(command, False)
 
-# -- Main --
 
-def main(command):
+def run_task(command):
     # Get the instruction to use.
     instruction = get_instruction(command)
 
     # If instruction is correct, then call it to action.
     if instruction != False:
         try:
-            # Call the task through the action file.
-            getattr(action, instruction)()
+            # Action script to impliment changes, only loaded when running the task in this process.
+            import action
+            # Call the task through the action file, queueing any task which writes behind the changes before it.
+            if instruction in queued_tasks:
+                # Mutation queue for the spreadsheet, only loaded when a task writes to it.
+                import mutations
+                mutations.get_queue().submit_call(getattr(action, instruction)).result()
+            else:
+                getattr(action, instruction)()
             # Set a message to indicate success.
             msg = [("Task `" + instruction + "` completed successfully!"), True]
         # If task doesn't execute, then return an error.
@@ -78,11 +81,132 @@ def main(command):
     return msg
 
 
+def parse_names(text):
+    # Read one name from the first filled cell of each line of csv text.
+    names = []
+    for row in csv.reader(io.StringIO(text)):
+        cells = [cell.strip() for cell in row if cell.strip() != ""]
+        if len(cells) > 0:
+            names.append(cells[0])
+
+    # Skip a header row if there is one.
+    if len(names) > 0 and names[0].lower() in name_headers:
+        names.pop(0)
+
+    # Return the names.
+    return names
+
+
+def check_name(name):
+    # Get why a payee name is not valid, or none if it is.
+    if name is None or name.strip() == "":
+        return "Payee name should not be empty!"
+    elif any(char.isdigit() for char in name):
+        return "Payee name should not contain any numbers!"
+    return None
+
+
+def check_payee(instruction, name):
+    # Action script and the local copy of the payee table, only loaded when checking payees.
+    import action
+    import ledger
+
+    # Without a recent copy, leave the check to the worksheet.
+    if not ledger.is_synced():
+        return None
+    # Otherwise check the payee can be added or removed without asking Google.
+    name = action.to_camel_case(name)
+    if instruction == "join" and ledger.has_payee(name):
+        return ValueError("Payee `" + name + "` is already in the worksheet!")
+    elif instruction == "leave" and not ledger.has_payee(name):
+        return KeyError("Payee `" + name + "` could not be found.")
+    return None
+
+
+def prepare_payees(instruction, names):
+    # Create a payee for each name, with the error of each name that is not valid.
+    payees = [{"name": name} for name in names]
+    results = []
+    for name in names:
+        reason = check_name(name)
+        results.append(check_payee(instruction, name) if reason is None else ValueError(reason))
+
+    # Return the payees and their results so far.
+    return payees, results
+
+
+def describe_payees(instruction, payees, results):
+    # Get why each payee failed, if it did.
+    reasons = []
+    for result in results:
+        if result is None:
+            reasons.append(None)
+        else:
+            reasons.append(str(result.args[0] if len(result.args) > 0 else repr(result)))
+    done = reasons.count(None)
+
+    # A single payee gets a single sentence.
+    if len(payees) == 1:
+        if reasons[0] is None:
+            return ["Successfully " + payee_tasks[instruction] + " `" + payees[0]["name"] + "`", True]
+        return [reasons[0], False]
+
+    # Otherwise write one line for each payee, and whether every payee was changed.
+    lines = ["Successfully " + payee_tasks[instruction] + " " + str(done) + " of " + str(len(payees)) + " payees."]
+    for payee, reason in zip(payees, reasons):
+        lines.append("✅ `" + payee["name"] + "`" if reason is None else "❌ `" + payee["name"] + "`: " + reason)
+    return ["\n".join(lines), done == len(payees)]
+
+
+def run_payees(instruction, names):
+    # Action script to impliment changes, only loaded when running the task in this process.
+    import action
+
+    # Apply every valid name in one batch.
+    payees, results = prepare_payees(instruction, names)
+    valid = [index for index, result in enumerate(results) if result is None]
+    if len(valid) > 0:
+        changes = [{"instruction": instruction, "payee": payees[index]} for index in valid]
+        for index, result in zip(valid, action.update_payees(changes)):
+            results[index] = result
+
+    # Return the summary.
+    msg = describe_payees(instruction, payees, results)
+    print(msg[0])
+    return msg
+
+
+# -- Main --
+
+def main(command, names=None):
+    # Hand the task to the running bot, which already has a warm session.
+    try:
+        reply = daemon.send(daemon.get_path(config), command, names=names)
+        print(reply["msg"][0])
+        print("Ran by the bot in " + str(reply["duration"]) + "s.")
+        return reply["msg"]
+    # If the bot is not running, run the task in this process instead.
+    except (FileNotFoundError, ConnectionRefusedError):
+        print("Bot could not be reached, running the task here.")
+        if names is not None:
+            return run_payees(command, names)
+        return run_task(command)
+
+
 # Call the get_instruction code.
 if __name__ == "__main__":
     # Command to check.
     command = sys.argv[1]
+    # Join and leave take names, or a csv file of names after `--csv`.
+    if command in payee_tasks:
+        if sys.argv[2:3] == ["--csv"]:
+            with open(sys.argv[3], encoding="utf-8-sig") as csv_file:
+                names = parse_names(csv_file.read())
+        else:
+            names = sys.argv[2:]
+        main(command, names)
     # Call main with command.
-    main(command)
+    else:
+        main(command)
 
 # -- End --
\ No newline at end of file
@@ -0,0 +1,133 @@
+# Script which runs the scheduled tasks from inside the bot, replacing cronjobs for runner.py.
+#
+# Part of a repository:
+# - https://github.com/kiweezi/halogen-pay
+# Created by:
+# - https://github.com/kiweezi
+#
+
+
+
+# Shebang
+#!/usr/bin/env python3
+
+# -- Imports --
+
+import time                                             # For timing the tasks.
+import asyncio                                          # For waiting between runs.
+from datetime import datetime, timedelta                # For handling dates.
+
+# -- End --
+
+
+
+# -- Global Variables --
+
+# The lowest and highest value of each cron field: minute, hour, day of month, month and day of week.
+field_limits = [(0, 59), (0, 23), (1, 31), (1, 12), (0, 7)]
+
+# -- End --
+
+
+
+def parse_field(field, low, high):
+    # Get every value a single cron field matches, e.g. `*/15`, `1-5` or `1,15`.
+    values = set()
+    for part in field.split(","):
+        # Get the step, which defaults to every value.
+        step = 1
+        if "/" in part:
+            part, step = part.split("/")
+            step = int(step)
+
+        # Get the range of values.
+        if part == "*":
+            start, end = low, high
+        elif "-" in part:
+            start, end = [int(value) for value in part.split("-")]
+        else:
+            start = int(part)
+            end = high if step != 1 else start
+
+        # Check the values are allowed for the field.
+        if start < low or end > high or start > end:
+            raise ValueError("Cron field `" + field + "` is out of range.")
+        values.update(range(start, (end + 1), step))
+
+    # Return the values.
+    return values
+
+def parse_cron(expression):
+    # Split the expression into its five fields.
+    fields = expression.split()
+    if len(fields) != 5:
+        raise ValueError("Cron expression `" + expression + "` should have 5 fields.")
+
+    # Get the values for each field.
+    parsed = [parse_field(field, low, high) for field, (low, high) in zip(fields, field_limits)]
+    # Sunday can be written as 0 or 7.
+    if 7 in parsed[4]:
+        parsed[4].add(0)
+
+    # Store whether the days were restricted, as cron matches either one when both are.
+    return {"fields": parsed, "any_day": fields[2] == "*", "any_weekday": fields[4] == "*"}
+
+def matches(cron, moment):
+    # Check the time of the moment matches.
+    minutes, hours, days, months, weekdays = cron["fields"]
+    if moment.minute not in minutes or moment.hour not in hours or moment.month not in months:
+        return False
+
+    # Check the day matches, with Sunday as 0.
+    day_match = moment.day in days
+    weekday_match = ((moment.weekday() + 1) % 7) in weekdays
+    if cron["any_day"] or cron["any_weekday"]:
+        return day_match and weekday_match
+    return day_match or weekday_match
+
+
+class Scheduler:
+    # Runs each configured entry when its cron expression matches.
+
+    def __init__(self, entries, run_task):
+        # Parse the entries once, so a bad expression is found at start up.
+        self.entries = []
+        for entry in entries:
+            self.entries.append({"cron": parse_cron(entry["cron"]), "expression": entry["cron"], "task": entry["task"]})
+        # Store the coroutine used to run a task and the tasks that are running.
+        self.run_task = run_task
+        self.running = set()
+
+
+    async def run_entry(self, entry):
+        # Do not start a task again while the last run is still going.
+        if entry["task"] in self.running:
+            print ("Scheduled task `" + entry["task"] + "` is still running, skipping this run.")
+            return
+
+        # Run the task and log how long it took.
+        self.running.add(entry["task"])
+        start = time.monotonic()
+        try:
+            result = await self.run_task(entry["task"])
+            print ("Scheduled task `" + entry["task"] + "` finished in " + str(round(time.monotonic() - start, 2)) + "s: " + str(result[0]))
+        except Exception as error:
+            print ("Scheduled task `" + entry["task"] + "` failed after " + str(round(time.monotonic() - start, 2)) + "s: " + repr(error))
+        finally:
+            self.running.discard(entry["task"])
+
+    async def run_forever(self):
+        # Log the entries being scheduled.
+        for entry in self.entries:
+            print ("Scheduled task `" + entry["task"] + "` at `" + entry["expression"] + "`.")
+
+        # Check the entries at the start of every minute.
+        moment = datetime.now().replace(second=0, microsecond=0)
+        while True:
+            moment += timedelta(minutes=1)
+            await asyncio.sleep(max(0, (moment - datetime.now()).total_seconds()))
+
+            # Start each matching entry without waiting for it, so one slow task does not delay the others.
+            for entry in self.entries:
+                if matches(entry["cron"], moment):
+                    asyncio.ensure_future(self.run_entry(entry))
@@ -0,0 +1,204 @@
+# Script which keeps one authenticated Google Sheets session alive for the whole process.
+#
+# Part of a repository:
+# - https://github.com/kiweezi/halogen-pay
+# Created by:
+# - https://github.com/kiweezi
+#
+
+
+
+# Shebang
+#!/usr/bin/env python3
+
+# -- Imports --
+
+import os                                               # For handling file paths and sizes.
+import time                                             # For timing how long the worksheet is cached.
+import threading                                        # For guarding the session between threads.
+import metrics                                          # For counting reconnections.
+import quota                                            # For pacing requests to Google.
+
+# -- End --
+
+
+
+# -- Global Variables --
+
+# Store the session for this process so it is only built once.
+state = {"creds": None, "client": None, "spreadsheet": None, "worksheet": None, "worksheet_time": 0, "revision": None}
+# Seconds to keep the current worksheet for reads before checking the list again, as another process may add a month.
+worksheet_ttl = 300
+# Guard the session so only one thread builds it at a time.
+lock = threading.RLock()
+
+# -- End --
+
+
+
+def is_auth_error(error):
+    # Check if the Google API rejected the request because of the credentials.
+    response = getattr(error, "response", None)
+    return getattr(response, "status_code", None) == 401
+
+
+def refresh_token():
+    # Refresh the access token if it has expired, using the credentials gspread converted and keeps on its HTTP client.
+    if state["client"] is None:
+        return
+    http = get_http(state["client"])
+    auth = getattr(http, "auth", None)
+    if auth is not None and getattr(auth, "expired", False):
+        http.login()
+
+
+def get_http(client):
+    # Get the object which makes the requests, which newer versions of gspread keep apart from the client.
+    return getattr(client, "http_client", client)
+
+
+def guard_requests(client):
+    # Store the original request method of the client.
+    http = get_http(client)
+    request = http.request
+
+    def guarded_request(*args, **kwargs):
+        # Work out which API the request is for, to time it against.
+        url = args[1] if len(args) > 1 else kwargs.get("endpoint", "")
+        api = "drive" if "/drive/" in url else "sheets"
+
+        # Make sure the token is still valid before the request is made.
+        with lock:
+            refresh_token()
+        try:
+            return quota.call(api, request, *args, **kwargs)
+        except Exception as error:
+            # Only reconnect on auth errors, anything else is raised as normal.
+            if not is_auth_error(error):
+                raise
+            print ("Google session rejected, reconnecting.")
+            # Log in again with the same credentials and retry the request once.
+            with lock:
+                http.login()
+            metrics.add_retry(api)
+            return quota.call(api, request, *args, **kwargs)
+
+    # Route every request made by the client through the guard.
+    http.request = guarded_request
+
+
+def authorize(gsheets_cfg):
+    # For editting Google sheets, only loaded once a session is needed.
+    import gspread
+    from oauth2client.service_account import ServiceAccountCredentials
+
+    # Get the credentials to access the spreadsheet.
+    creds = ServiceAccountCredentials.from_json_keyfile_name(os.path.abspath(gsheets_cfg["cred"]), gsheets_cfg["scope"])
+    # Authenticates with the Google API.
+    client = gspread.authorize(creds)
+    guard_requests(client)
+
+    # Store the new session.
+    state["creds"] = creds
+    state["client"] = client
+    state["spreadsheet"] = None
+    state["worksheet"] = None
+    print ("Authenticated with Google API.")
+
+
+def get_client(gsheets_cfg):
+    # Build the client the first time it is needed.
+    with lock:
+        if state["client"] is None:
+            authorize(gsheets_cfg)
+        # Refresh the token if it has expired since it was last used.
+        refresh_token()
+
+        # Return the client.
+        return state["client"]
+
+
+def get_token(gsheets_cfg, renew=False):
+    # Get an access token for requests made without gspread, logging in again first if the last one was rejected.
+    with lock:
+        http = get_http(get_client(gsheets_cfg))
+        if renew:
+            http.login()
+
+        # Return the token gspread sends, from the credentials it converted and refreshes on its HTTP client.
+        auth = getattr(http, "auth", None)
+        if auth is not None:
+            if auth.token is None:
+                http.login()
+            return auth.token
+        # Older versions of gspread refresh the original credentials instead.
+        return state["creds"].get_access_token().access_token
+
+
+def get_spreadsheet(gsheets_cfg):
+    # Open the spreadsheet the first time it is needed.
+    with lock:
+        client = get_client(gsheets_cfg)
+        # Open it again if the config now names a different spreadsheet.
+        if state["spreadsheet"] is None or state["spreadsheet"].title != gsheets_cfg["spreadsheet"]:
+            state["spreadsheet"] = client.open(gsheets_cfg["spreadsheet"])
+            state["worksheet"] = None
+
+        # Return the spreadsheet.
+        return state["spreadsheet"]
+
+
+def get_worksheet(gsheets_cfg, fresh=False):
+    # Get the current worksheet, only listing the worksheets again once the cached one expires, or straight away for writes.
+    with lock:
+        spreadsheet = get_spreadsheet(gsheets_cfg)
+        if fresh or state["worksheet"] is None or time.monotonic() - state["worksheet_time"] > worksheet_ttl:
+            state["worksheet"] = spreadsheet.worksheets()[0]
+            state["worksheet_time"] = time.monotonic()
+
+        # Return the worksheet.
+        return state["worksheet"]
+
+
+def get_revision(gsheets_cfg):
+    # For the Drive API address, only loaded once a session is needed.
+    from gspread.urls import DRIVE_FILES_API_V3_URL
+
+    # Ask Drive when the spreadsheet was last changed, which is far smaller than reading any cells.
+    spreadsheet = get_spreadsheet(gsheets_cfg)
+    params = {"fields": "modifiedTime,version", "supportsAllDrives": True}
+    response = get_http(spreadsheet.client).request("get", DRIVE_FILES_API_V3_URL + "/" + spreadsheet.id, params=params)
+
+    # Return a value which changes with every edit, after checking it against the cached worksheet.
+    revision = to_revision(response.json())
+    note_revision(revision)
+    return revision
+
+
+def to_revision(metadata):
+    # Get a value which changes with every edit from the spreadsheet's Drive metadata.
+    return metadata.get("version", "") + "@" + metadata["modifiedTime"]
+
+
+def note_revision(revision):
+    # Drop the cached worksheet when the spreadsheet has changed, as another process may have added a month.
+    with lock:
+        if state["revision"] != revision:
+            state["revision"] = revision
+            state["worksheet"] = None
+
+
+def forget_worksheet():
+    # Drop the cached worksheet so the next call lists the worksheets again.
+    with lock:
+        state["worksheet"] = None
+
+
+def reset():
+    # Drop the session so the next call authenticates again.
+    with lock:
+        state["creds"] = None
+        state["client"] = None
+        state["spreadsheet"] = None
+        state["worksheet"] = None
+        state["revision"] = None
@@ -0,0 +1,145 @@
+# Script which loads the config file once and shares a read-only view of it with the other scripts.
+#
+# Part of a repository:
+# - https://github.com/kiweezi/halogen-pay
+# Created by:
+# - https://github.com/kiweezi
+#
+
+
+
+# Shebang
+#!/usr/bin/env python3
+
+# -- Imports --
+
+import os                                               # For handling file paths and sizes.
+import json                                             # For handling json files.
+import time                                             # For limiting how often the file is checked.
+import threading                                        # For guarding reloads between threads.
+from types import MappingProxyType                      # For read-only dictionaries.
+from collections.abc import Mapping                     # For the config view.
+
+# -- End --
+
+
+
+# -- Global Variables --
+
+# Set the working directory.
+os.chdir(os.path.abspath(os.path.join(os.path.realpath(__file__), "../../")))
+# Set configuration file path.
+cfg_path = os.path.abspath("config/cfg.json")
+# Seconds between checks of the file for changes.
+check_interval = 2
+# Keys each section of the config must have.
+required_keys = {
+    "gsheets": ["spreadsheet", "cred", "scope"],
+    "discord": ["channel", "modRole", "allRole", "everyone", "webhook", "token"],
+    "paypal": ["pool", "thumbnail"]
+}
+# Store the loaded config and when the file was last checked.
+state = {"data": None, "mtime": None, "checked": 0, "version": 0}
+lock = threading.Lock()
+
+# -- End --
+
+
+
+def freeze(value):
+    # Make the value read-only, so no script can change the shared config.
+    if isinstance(value, dict):
+        return MappingProxyType({key: freeze(item) for key, item in value.items()})
+    elif isinstance(value, list):
+        return tuple(freeze(item) for item in value)
+    return value
+
+
+def validate(data):
+    # Check the top level sections exist.
+    for section in ["games", "gsheets", "discord", "paypal", "tasks"]:
+        if section not in data:
+            raise ValueError("Config is missing `" + section + "`.")
+
+    # Check each section has the keys it needs.
+    for section, keys in required_keys.items():
+        for key in keys:
+            if key not in data[section]:
+                raise ValueError("Config is missing `" + section + "." + key + "`.")
+
+    # Check each game has a name, whitelist path and state.
+    for game in data["games"]:
+        for key in ["name", "path", "whitelist"]:
+            if key not in game:
+                raise ValueError("Config game is missing `" + key + "`.")
+
+    # Check each task is a list of its instruction and aliases.
+    for task in data["tasks"]:
+        if not isinstance(task, list) or len(task) == 0 or not all(isinstance(alias, str) for alias in task):
+            raise ValueError("Config task `" + str(task) + "` should be a list of names.")
+
+
+def load():
+    # Load the config file into the program.
+    mtime = os.stat(cfg_path).st_mtime
+    with open(cfg_path) as json_file:
+        data = json.load(json_file)
+    validate(data)
+
+    # Store the read-only config.
+    state["data"] = freeze(data)
+    state["mtime"] = mtime
+    state["version"] += 1
+
+
+def refresh():
+    # Only check the file every few seconds.
+    with lock:
+        if state["data"] is not None and time.monotonic() - state["checked"] < check_interval:
+            return
+        state["checked"] = time.monotonic()
+
+        # Load the config the first time, letting any error stop the program.
+        if state["data"] is None:
+            load()
+            return
+
+        # Reload the config if the file has changed since it was loaded.
+        try:
+            if os.stat(cfg_path).st_mtime != state["mtime"]:
+                load()
+                print ("Config reloaded from " + cfg_path)
+        # Keep the last good config if the new one is broken.
+        except (OSError, ValueError) as error:
+            print ("Config could not be reloaded, keeping the last one: " + str(error))
+
+
+def get():
+    # Get the current config.
+    refresh()
+    return state["data"]
+
+
+def version():
+    # Get a number which changes each time the config is reloaded.
+    refresh()
+    return state["version"]
+
+
+class Config(Mapping):
+    # A read-only view which always reads from the latest config.
+
+    def __getitem__(self, key):
+        return get()[key]
+
+    def __iter__(self):
+        return iter(get())
+
+    def __len__(self):
+        return len(get())
+
+
+# The shared config view.
+config = Config()
+# Load the config now so a broken file is found at start up.
+refresh()
@@ -0,0 +1,214 @@
+# Script which reads a worksheet once and answers lookups from the local copy.
+#
+# Part of a repository:
+# - https://github.com/kiweezi/halogen-pay
+# Created by:
+# - https://github.com/kiweezi
+#
+
+
+
+# Shebang
+#!/usr/bin/env python3
+
+# -- Imports --
+
+from datetime import date                               # For handling dates.
+
+# -- End --
+
+
+
+class Snapshot:
+    # A local copy of every value in a worksheet, indexed for lookups.
+
+    def __init__(self, worksheet, values):
+        # Store the worksheet and its values.
+        self.worksheet = worksheet
+        self.values = values
+
+        # Index the position of the first cell for each value, the same cell a find() would return.
+        self.index = {}
+        for row_no, row in enumerate(values, start=1):
+            for col_no, value in enumerate(row, start=1):
+                if value != "" and value not in self.index:
+                    self.index[value] = (row_no, col_no)
+
+        # Index the headers of the payee table by column.
+        self.columns = {}
+        self.names = {}
+        if "Payee" in self.index:
+            header_row, header_col = self.index["Payee"]
+            for col_no, value in enumerate(values[header_row - 1], start=1):
+                if value != "" and value not in self.columns:
+                    self.columns[value] = col_no
+
+            # Index the rows of the payees by name.
+            for row_no in range(header_row + 1, header_row + 1 + self.payee_count()):
+                name = self.cell(row_no, header_col)
+                if name != "" and name not in self.names:
+                    self.names[name] = row_no
+
+
+    def cell(self, row, col):
+        # Get the value of a cell, returning empty for cells outside of the values read.
+        if row <= len(self.values) and col <= len(self.values[row - 1]):
+            return self.values[row - 1][col - 1]
+        return ""
+
+    def row(self, row):
+        # Get a copy of the values in a row, returning empty for rows outside of the values read.
+        if row <= len(self.values):
+            return list(self.values[row - 1])
+        return []
+
+    def find(self, value):
+        # Get the row and collumn of the first cell with the value.
+        if value not in self.index:
+            raise KeyError("Cell `" + value + "` could not be found.")
+        return self.index[value]
+
+    def value_below(self, header):
+        # Get the value of the cell below the specified header.
+        row, col = self.find(header)
+        return self.cell(row + 1, col)
+
+    def payee_count(self):
+        # Use the payee count from the worksheet when it has one.
+        if "Number of payees" in self.index:
+            return int(self.value_below("Number of payees"))
+
+        # Otherwise count the names until the first empty row.
+        header_row, header_col = self.find("Payee")
+        count = 0
+        while self.cell(header_row + 1 + count, header_col) != "":
+            count += 1
+        return count
+
+    def payee_row(self, name):
+        # Get the row which the payee is on.
+        if name not in self.names:
+            raise KeyError("Payee `" + name + "` could not be found.")
+        return self.names[name]
+
+    def column(self, header):
+        # Get the values of each payee under a header of the payee table.
+        col = self.columns[header]
+        return {name: self.cell(row, col) for name, row in self.names.items()}
+
+
+def read_snapshot(worksheet):
+    # Read every value in the worksheet with a single request.
+    return Snapshot(worksheet, worksheet.get_all_values())
+
+
+def to_a1(row, col):
+    # Convert a row and collumn number into A1 notation, e.g. 2, 28 is AB2.
+    letters = ""
+    while col > 0:
+        col, remainder = divmod(col - 1, 26)
+        letters = chr(ord("A") + remainder) + letters
+    return letters + str(row)
+
+
+def to_range(title, start_row, start_col, end_row, end_col):
+    # Get a range of a worksheet in A1 notation, quoting the title as the API expects.
+    return "'" + title.replace("'", "''") + "'!" + to_a1(start_row, start_col) + ":" + to_a1(end_row, end_col)
+
+
+def to_cell(value):
+    # Convert a value into the cell data used by a batch update.
+    # Dates are written as their serial number with a date format, so they do not depend on the sheet locale.
+    if isinstance(value, date):
+        serial = (value - date(1899, 12, 30)).days
+        return {"userEnteredValue": {"numberValue": serial}, "userEnteredFormat": {"numberFormat": {"type": "DATE", "pattern": "dd/mm/yyyy"}}}
+    elif isinstance(value, bool):
+        return {"userEnteredValue": {"boolValue": value}}
+    elif isinstance(value, (int, float)):
+        return {"userEnteredValue": {"numberValue": value}}
+    elif isinstance(value, str) and value.startswith("="):
+        return {"userEnteredValue": {"formulaValue": value}}
+    else:
+        return {"userEnteredValue": {"stringValue": str(value)}}
+
+
+class WriteBatch:
+    # Queues changes to a worksheet and sends them all in one batch update.
+
+    def __init__(self, worksheet):
+        # Store the worksheet, the worksheet changes are made to and the queue of requests.
+        self.worksheet = worksheet
+        self.sheet_id = worksheet.id
+        self.requests = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        # Only send the changes if the action completed.
+        if exc_type is None:
+            self.flush()
+
+
+    def duplicate_sheet(self, title, sheet_id, index=0):
+        # Copy the worksheet to a new one with the id given, then make every later change to the copy.
+        self.requests.append({"duplicateSheet": {
+            "sourceSheetId": self.worksheet.id,
+            "insertSheetIndex": index,
+            "newSheetId": sheet_id,
+            "newSheetName": title
+        }})
+        self.sheet_id = sheet_id
+
+    def delete_sheet(self, sheet_id):
+        # Delete a whole worksheet.
+        self.requests.append({"deleteSheet": {"sheetId": sheet_id}})
+
+    def insert_row(self, values, index, inherit_from_before=False):
+        # Insert an empty row, then fill it with the values.
+        self.requests.append({"insertDimension": {
+            "range": {"sheetId": self.sheet_id, "dimension": "ROWS", "startIndex": index - 1, "endIndex": index},
+            "inheritFromBefore": inherit_from_before
+        }})
+        self.update_range(index, 1, [values])
+
+    def delete_row(self, index):
+        # Delete a single row.
+        self.requests.append({"deleteDimension": {
+            "range": {"sheetId": self.sheet_id, "dimension": "ROWS", "startIndex": index - 1, "endIndex": index}
+        }})
+
+    def copy_format(self, source_row, destination_row):
+        # Copy the formatting of one row onto another, leaving the values as they are.
+        self.requests.append({"copyPaste": {
+            "source": {"sheetId": self.sheet_id, "startRowIndex": source_row - 1, "endRowIndex": source_row},
+            "destination": {"sheetId": self.sheet_id, "startRowIndex": destination_row - 1, "endRowIndex": destination_row},
+            "pasteType": "PASTE_FORMAT"
+        }})
+
+    def update_cell(self, row, col, value):
+        # Write a single value or formula to a cell.
+        cell = to_cell(value)
+        # Only change the number format as well when the value brings its own.
+        fields = "userEnteredValue"
+        if "userEnteredFormat" in cell:
+            fields += ",userEnteredFormat.numberFormat"
+        self.requests.append({"updateCells": {
+            "rows": [{"values": [cell]}],
+            "fields": fields,
+            "start": {"sheetId": self.sheet_id, "rowIndex": row - 1, "columnIndex": col - 1}
+        }})
+
+    def update_range(self, row, col, values):
+        # Write rows of values or formulas, starting from the cell given.
+        self.requests.append({"updateCells": {
+            "rows": [{"values": [to_cell(value) for value in row_values]} for row_values in values],
+            "fields": "userEnteredValue",
+            "start": {"sheetId": self.sheet_id, "rowIndex": row - 1, "columnIndex": col - 1}
+        }})
+
+    def flush(self):
+        # Send every queued change in one request.
+        if self.requests:
+            self.worksheet.spreadsheet.batch_update({"requests": self.requests})
+            self.requests = []
@@ -0,0 +1,116 @@
+# Script which sends embeds to the Discord webhook over a pooled connection, following Discord's rate limits.
+#
+# Part of a repository:
+# - https://github.com/kiweezi/halogen-pay
+# Created by:
+# - https://github.com/kiweezi
+#
+
+
+
+# Shebang
+#!/usr/bin/env python3
+
+# -- Imports --
+
+import json                                             # For handling json files.
+import time                                             # For waiting on rate limits.
+import threading                                        # For sharing the webhook between threads.
+import metrics                                          # For timing requests to Discord.
+from settings import config                             # For the shared, cached config.
+
+# -- End --
+
+
+
+# -- Global Variables --
+
+# Most embeds Discord accepts in one message.
+max_embeds = 10
+# Most attempts made to send a message before giving up.
+max_attempts = 5
+# Seconds to wait for Discord before giving up on a request.
+timeout = 10
+# Store the webhook url, the HTTP session and when the rate limit bucket resets.
+state = {"cred_path": None, "url": None, "session": None, "reset_at": 0}
+lock = threading.RLock()
+
+# -- End --
+
+
+
+def get_url():
+    # Read the webhook url from its credential file, only again if the config points somewhere else.
+    cred_path = config["discord"]["webhook"]
+    if state["url"] is None or state["cred_path"] != cred_path:
+        with open(cred_path) as json_file:
+            state["url"] = json.load(json_file)["cred"]
+        state["cred_path"] = cred_path
+
+    # Return the url.
+    return state["url"]
+
+
+def get_session():
+    # For requests to Discord, only loaded when a message is sent.
+    import requests
+
+    # Reuse one session so the connection to Discord is pooled.
+    if state["session"] is None:
+        state["session"] = requests.Session()
+    return state["session"]
+
+
+def to_dict(embed):
+    # Get the json for an embed, which may already be a dictionary.
+    if isinstance(embed, dict):
+        return embed
+    return embed.to_dict()
+
+
+def post(payload):
+    # Send a message, waiting out Discord's rate limits and retrying on server errors.
+    for attempt in range(1, (max_attempts + 1)):
+        # Wait if the last response said the bucket was empty.
+        delay = state["reset_at"] - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+        with metrics.external("discord"):
+            response = get_session().post(get_url(), params={"wait": "true"}, json=payload, timeout=timeout)
+
+        # Remember when the bucket resets if this request used it up.
+        if response.headers.get("X-RateLimit-Remaining") == "0":
+            state["reset_at"] = time.monotonic() + float(response.headers.get("X-RateLimit-Reset-After", 0))
+
+        # If rate limited, wait as long as Discord asks and try again.
+        if response.status_code == 429:
+            retry_after = float(response.headers.get("Retry-After", 1))
+            print ("Webhook rate limited, retrying in " + str(retry_after) + "s.")
+            state["reset_at"] = time.monotonic() + retry_after
+            metrics.add_retry("discord")
+            continue
+        # If Discord had an error, back off and try again.
+        if response.status_code >= 500 and attempt < max_attempts:
+            print ("Webhook failed with " + str(response.status_code) + ", retrying.")
+            time.sleep(2 ** (attempt - 1))
+            metrics.add_retry("discord")
+            continue
+
+        # Raise any other error, otherwise the message was sent.
+        response.raise_for_status()
+        return response
+
+    raise RuntimeError("Webhook message could not be sent after " + str(max_attempts) + " attempts.")
+
+
+def post_all(embeds):
+    # Send embeds, up to ten in each message.
+    for start in range(0, len(embeds), max_embeds):
+        post({"embeds": embeds[start:(start + max_embeds)]})
+
+
+def send(*embeds):
+    # Send embeds straight away, sharing messages when there are several.
+    with lock:
+        post_all([to_dict(embed) for embed in embeds])
@@ -15,7 +15,9 @@
 
 import os                                               # For handling file paths and sizes.
 import json                                             # For handling json files.
-from requests import get                                # For requests from the API.
+import threading                                        # For guarding the whitelists between threads.
+import mojang                                           # For looking up Minecraft player UUIDs.
+from settings import config                             # For the shared, cached config.
 
 # -- End --
 
@@ -23,15 +25,11 @@ from requests import get                                # For requests from the
 
 # -- Global Variables --
 
-# Set the working directory.
-os.chdir(os.path.abspath(os.path.join(os.path.realpath(__file__), "../../")))
-# Set configuration file path.
-cfg_path = os.path.abspath("config/cfg.json")
-# Load the config file into the program.
-with open(cfg_path) as json_file:
-    config = json.load(json_file)
 # Define valid instructions.
 valid_instructions = ["add", "remove", "update"]
+# Store the loaded whitelists by file path.
+stores = {}
+lock = threading.RLock()
 
 # -- End --
 
@@ -48,70 +46,210 @@ def get_game_config(game):
             return game_cfg
 
 
+def atomic_write(path, text):
+    # Write to a temporary file only this thread uses and flush it to disk.
+    tmp_path = path + "." + str(os.getpid()) + "." + str(threading.get_ident()) + ".tmp"
+    with open(tmp_path, "w") as file:
+        file.write(text)
+        file.flush()
+        os.fsync(file.fileno())
+
+    # Replace the old file in one step, so the game server never reads half a whitelist.
+    os.replace(tmp_path, path)
+
+
+# -- Stores --
+
+class WhitelistStore:
+    # A whitelist file held in memory, indexed by member.
+
+    def __init__(self, path):
+        # Store the path and load the file.
+        self.path = path
+        self.load()
+
+
+    def key(self, member_id):
+        # Get the key a member is indexed by.
+        return member_id
+
+    def __contains__(self, member_id):
+        return self.key(member_id) in self.members
+
+    def ids(self):
+        # Get the ID of every member.
+        return [self.get_id(member) for member in self.members.values()]
+
+    def is_stale(self):
+        # Check if the file has changed since it was loaded, e.g. by the game server.
+        try:
+            return os.stat(self.path).st_mtime != self.mtime
+        except OSError:
+            return self.mtime is not None
+
+    def load(self):
+        # Read the file, treating a missing file as an empty whitelist.
+        try:
+            self.mtime = os.stat(self.path).st_mtime
+            with open(self.path) as file:
+                text = file.read()
+        except OSError:
+            self.mtime = None
+            text = ""
+        self.parse(text)
+
+    def update(self, removed=(), added=None):
+        # Remove and add members in memory.
+        added = added or {}
+        changed = False
+        for member_id in removed:
+            if member_id != "" and self.key(member_id) in self.members:
+                del self.members[self.key(member_id)]
+                changed = True
+        for member_id, member in added.items():
+            if member_id != "" and self.key(member_id) not in self.members:
+                self.members[self.key(member_id)] = member
+                changed = True
+
+        # Write the file once, only if something changed.
+        if changed:
+            atomic_write(self.path, self.dump())
+            self.mtime = os.stat(self.path).st_mtime
+
+        # Return whether the whitelist changed.
+        return changed
+
+
+class JsonStore(WhitelistStore):
+    # A json list of members with a name and UUID, as used by Minecraft.
+
+    def key(self, member_id):
+        # Minecraft names ignore case.
+        return member_id.lower()
+
+    def get_id(self, member):
+        return member["name"]
+
+    def parse(self, text):
+        # Index the members by name, keeping the order of the file.
+        self.members = {}
+        for member in (json.loads(text) if text.strip() != "" else []):
+            self.members[self.key(member["name"])] = member
+
+    def dump(self):
+        return json.dumps(list(self.members.values()), indent=4)
+
+
+class LineStore(WhitelistStore):
+    # A text file with one member ID per line, as used by Valheim.
+
+    def get_id(self, member):
+        return member
+
+    def parse(self, text):
+        # Keep any comment lines, then index the IDs, keeping the order of the file.
+        self.comments = []
+        self.members = {}
+        for line in text.splitlines():
+            if line.startswith("//"):
+                self.comments.append(line)
+            elif line.strip() != "":
+                self.members[self.key(line.strip())] = line.strip()
+
+    def dump(self):
+        # Write one line per comment and ID, ending with a new line.
+        return "".join(line + "\n" for line in self.comments + list(self.members.values()))
+
+
+def get_store(game_cfg, store_class):
+    # Load the whitelist the first time, or again if the file has changed on disk.
+    path = os.path.abspath(game_cfg["path"])
+    with lock:
+        if path not in stores or stores[path].is_stale():
+            stores[path] = store_class(path)
+
+        # Return the store.
+        return stores[path]
+
+
 # -- Games --
 
+def build_minecraft(new_ids):
+    # Get the UUIDs of every new player in as few requests as possible.
+    uuids = mojang.lookup(new_ids)
+    # Create the members for the players that exist.
+    return {member_id: {"name": member_id, "uuid": uuid} for member_id, uuid in uuids.items() if uuid is not None}
+
+def build_valheim(new_ids):
+    # Valheim members are just their ID.
+    return {member_id: member_id for member_id in new_ids}
+
+# Define the type of whitelist file each game uses, and how its new members are created.
+store_classes = {"minecraft": JsonStore, "valheim": LineStore}
+member_builders = {"minecraft": build_minecraft, "valheim": build_valheim}
+
+
 def minecraft(instruction, payee):
     # Get game config.
     game_cfg = get_game_config("Minecraft")
-    
+
     # Only continue if whitelist state is valid.
     if game_cfg["whitelist"] == True:
+        # Hold the whitelists so no other change lands between reading and writing.
+        with lock:
+            # Get the whitelist.
+            whitelist = get_store(game_cfg, JsonStore)
+
+            # If new ID is not already in the list, then create the member to add to the bottom.
+            added = {}
+            if payee["new_id"] != "" and (payee["new_id"] not in whitelist or whitelist.key(payee["new_id"]) == whitelist.key(payee["old_id"])):
+                # Get the player uuid from the cache or Mojang's API.
+                uuid = mojang.get_uuid(payee["new_id"])
+                added[payee["new_id"]] = {"name": payee["new_id"], "uuid": uuid}
 
-        # Open the whitelist file.
-        with open(game_cfg["path"]) as file:
-            whitelist = json.load(file)
-        # Create a list to store the names of the whitelist members.
-        whitelist_names = []
-
-        # Loop through the whitelist members.
-        for member in whitelist:
-            # If the old ID still exists in the list, remove it.
-            if payee["old_id"] == member["name"]:
-                whitelist.remove(member)
-                with open(game_cfg["path"], "w") as file:
-                    json.dump(whitelist, file, indent=4)
-            # Store the usernames of the members.
-            whitelist_names += member["name"]
-
-        # If new ID is not already in the list, then add it to the bottom.
-        if payee["new_id"] not in whitelist_names:
-            # Get the player uuid from Mojang's API.
-            headers = {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/74.0.3729.169 Safari/537.36"}
-            api_url = "https://api.mojang.com/users/profiles/minecraft/" + payee["new_id"]
-            response = get(api_url, headers=headers)
-            u = response.json()["id"]
-            uuid = "-".join((u[0:8], u[8:12], u[12:16], u[16:20], u[20:]))
-
-            # Create the member to add to the whitelist file.
-            member = {"name": payee["new_id"], "uuid": uuid}
-
-            # Add the new member to the whitelist.
-            whitelist.append(member)
-            with open(game_cfg["path"], "w") as file:
-                    json.dump(whitelist, file, indent=4)
+            # Remove the old ID and add the new one with a single write.
+            whitelist.update(removed=[payee["old_id"]], added=added)
 
 
 def valheim(instruction, payee):
     # Get game config.
     game_cfg = get_game_config("Valheim")
-    
+
     # Only continue if whitelist state is valid.
     if game_cfg["whitelist"] == True:
+        # Hold the whitelists so no other change lands between reading and writing.
+        with lock:
+            # Get the whitelist.
+            whitelist = get_store(game_cfg, LineStore)
+
+            # Remove the old ID and add the new one to the bottom with a single write.
+            whitelist.update(removed=[payee["old_id"]], added={payee["new_id"]: payee["new_id"]})
 
-        # Open the whitelist file.
-        with open(game_cfg["path"]) as file:
-            whitelist = file.read().splitlines()
 
-        # If the old ID still exists in the list, remove it.
-        if payee["old_id"] in whitelist:
-            with open(game_cfg["path"], "w") as file:
-                for line in whitelist:
-                    if line != payee["old_id"]:
-                        file.write(line)
+# -- Reconcile --
 
-        # If new ID is not already in the list, then add it to the bottom.
-        if payee["new_id"] not in whitelist:
-            with open(game_cfg["path"], "a") as file:
-                file.write("\n" + payee["new_id"])
+def reconcile(game, member_ids):
+    # Get game config.
+    game_cfg = get_game_config(game.capitalize())
+
+    # Only continue if whitelist state is valid.
+    if game_cfg is None or game_cfg["whitelist"] != True:
+        return None
+    # Hold the whitelists so no other change lands between reading and writing.
+    with lock:
+        # Get the whitelist.
+        whitelist = get_store(game_cfg, store_classes[game])
 
-# -- End --
\ No newline at end of file
+        # Work out which members should be removed and which are new.
+        wanted = {whitelist.key(member_id): member_id for member_id in member_ids if member_id != ""}
+        removed = [member_id for member_id in whitelist.ids() if whitelist.key(member_id) not in wanted]
+        new_ids = [member_id for member_id in wanted.values() if member_id not in whitelist]
+
+        # Create the new members, then apply every change with a single write.
+        added = member_builders[game](new_ids)
+        whitelist.update(removed=removed, added=added)
+
+    # Return the changes made, and any IDs which could not be added.
+    return {"added": list(added), "removed": removed, "missing": [member_id for member_id in new_ids if member_id not in added]}
+
+# -- End --